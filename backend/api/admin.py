@@ -7,6 +7,7 @@ from .models import (
     Favorite,
     ShoppingCart,
     Subscribe,
+    Job,
 )
 
 
@@ -23,9 +24,10 @@ class RecipeAdmin(admin.ModelAdmin):
     search_fields = ("name", "author__username")
 
     def get_favorites_count(self, obj):
-        return obj.favorites.count()
+        return obj.favorites_count
 
     get_favorites_count.short_description = "В избранном"
+    get_favorites_count.admin_order_field = "favorites_count"
 
 
 @admin.register(Ingredient)
@@ -50,3 +52,9 @@ class ShoppingCartAdmin(admin.ModelAdmin):
 class SubscribeAdmin(admin.ModelAdmin):
     list_display = ("user", "author")
     list_filter = ("user", "author")
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("name", "status", "priority", "attempts", "run_at", "locked_by")
+    list_filter = ("status", "name")
@@ -0,0 +1,220 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db import close_old_connections
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import APIException, AuthenticationFailed, NotFound
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from .compression import choose_encoding
+from .conditional import ingredients_state, recipe_state
+from .filters import RecipeFilter
+from .ingredient_index import ingredient_index
+from .models import Recipe
+from .pagination import CustomPagination
+from .response_cache import (
+    cached_response,
+    detail_cache_key,
+    is_cache_enabled,
+    list_cache_key,
+)
+from .serializers import CustomUserSerializer, RecipeReadSerializer
+from .views import IngredientViewSet, RecipeViewSet, UserViewSet, get_recipe_queryset
+
+
+def to_json_response(response):
+    return JsonResponse(
+        response.data,
+        status=response.status_code,
+        safe=False,
+        json_dumps_params={"ensure_ascii": False},
+    )
+
+
+def get_token(key):
+    return Token.objects.select_related("user").filter(key=key).first()
+
+
+async def authenticate(request):
+    keyword, _, key = request.headers.get("Authorization", "").partition(" ")
+    if keyword != "Token" or not key.strip():
+        return AnonymousUser()
+    token = await sync_to_async(get_token)(key.strip())
+    if token is None or not token.user.is_active:
+        raise AuthenticationFailed("Invalid token.")
+    return token.user
+
+
+def get_drf_request(request):
+    drf_request = Request(request)
+    drf_request.user = request.user
+    return drf_request
+
+
+def in_worker_thread(load):
+    def inner(*args, **kwargs):
+        close_old_connections()
+        try:
+            return load(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(inner, thread_sensitive=False)
+
+
+def async_api_view(load, fallback):
+    # The ORM of this Django version is synchronous, so the view does the
+    # authentication and response handling on the event loop and runs the
+    # database work in a worker thread instead of holding one per request.
+    # Other methods are passed on to the regular viewset.
+    load = in_worker_thread(load)
+    fallback = sync_to_async(fallback)
+
+    async def view(request, *args, **kwargs):
+        if request.method not in ("GET", "HEAD"):
+            return await fallback(request, *args, **kwargs)
+        try:
+            request.user = await authenticate(request)
+            response = await load(request, *args, **kwargs)
+        except APIException as error:
+            response = Response({"detail": error.detail}, error.status_code)
+        if isinstance(response, Response):
+            response = to_json_response(response)
+        if response.status_code == 401:
+            # As TokenAuthentication.authenticate_header does for DRF views.
+            response["WWW-Authenticate"] = "Token"
+        patch_vary_headers(response, ("Authorization",))
+        return response
+
+    # CSRF is checked by the viewsets, as for the regular routes.
+    view.csrf_exempt = True
+    return view
+
+
+def get_not_modified(request, state):
+    etag, last_modified = state
+    if not request.user.is_anonymous:
+        last_modified = None
+    headers = {"ETag": f'"{etag}"'}
+    if last_modified:
+        headers["Last-Modified"] = http_date(last_modified.timestamp())
+    response = get_conditional_response(
+        request,
+        etag=headers["ETag"],
+        last_modified=last_modified and int(last_modified.timestamp()),
+    )
+    return response, headers
+
+
+def load_recipe_list(request):
+    drf_request = get_drf_request(request)
+    filterset = RecipeFilter(
+        request.GET, get_recipe_queryset(request.user), request=drf_request
+    )
+    if not filterset.is_valid():
+        return Response(filterset.errors, status=400)
+
+    def get_response():
+        paginator = CustomPagination()
+        page = paginator.paginate_queryset(filterset.qs, drf_request)
+        serializer = RecipeReadSerializer(
+            page, many=True, context={"request": drf_request}
+        )
+        return paginator.get_paginated_response(serializer.data)
+
+    if is_cache_enabled(drf_request):
+        return cached_response(list_cache_key(drf_request), get_response)
+    return get_response()
+
+
+def load_recipe_detail(request, pk):
+    state = recipe_state(request, pk=pk)
+    if state is None:
+        raise NotFound()
+    not_modified, headers = get_not_modified(request, state)
+    if not_modified is not None:
+        return not_modified
+
+    drf_request = get_drf_request(request)
+
+    def get_response():
+        try:
+            recipe = get_recipe_queryset(request.user).get(pk=pk)
+        except Recipe.DoesNotExist:
+            raise NotFound()
+        return Response(
+            RecipeReadSerializer(recipe, context={"request": drf_request}).data
+        )
+
+    if is_cache_enabled(drf_request):
+        response = cached_response(detail_cache_key(drf_request, pk), get_response)
+    else:
+        response = get_response()
+    response = to_json_response(response)
+    for header, value in headers.items():
+        response[header] = value
+    return response
+
+
+def load_ingredient_list(request):
+    state = ingredients_state(request)
+    not_modified, headers = get_not_modified(request, state)
+    if not_modified is not None:
+        return not_modified
+    ingredient_index.sync(state[0])
+
+    name = request.GET.get("name")
+    if name:
+        response = Response(
+            ingredient_index.search(name, settings.INGREDIENT_SEARCH_LIMIT)
+        )
+    else:
+        encoding = choose_encoding(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        response = HttpResponse(
+            ingredient_index.payload()[encoding], content_type="application/json"
+        )
+        if encoding != "identity":
+            response["Content-Encoding"] = encoding
+            headers["ETag"] = f'W/{headers["ETag"]}'
+        patch_vary_headers(response, ("Accept-Encoding",))
+
+    if isinstance(response, Response):
+        response = to_json_response(response)
+    for header, value in headers.items():
+        response[header] = value
+    return response
+
+
+def load_me(request):
+    if request.user.is_anonymous:
+        return Response(
+            {"detail": "Authentication credentials were not provided."}, status=401
+        )
+    serializer = CustomUserSerializer(
+        request.user, context={"request": get_drf_request(request)}
+    )
+    return Response(serializer.data)
+
+
+recipe_list = async_api_view(
+    load_recipe_list, RecipeViewSet.as_view({"get": "list", "post": "create"})
+)
+recipe_detail = async_api_view(
+    load_recipe_detail,
+    RecipeViewSet.as_view(
+        {
+            "get": "retrieve",
+            "put": "update",
+            "patch": "partial_update",
+            "delete": "destroy",
+        }
+    ),
+)
+ingredient_list = async_api_view(
+    load_ingredient_list, IngredientViewSet.as_view({"get": "list"})
+)
+me = async_api_view(load_me, UserViewSet.as_view({"get": "me"}))
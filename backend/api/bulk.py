@@ -0,0 +1,100 @@
+from django.db import transaction
+from django.utils import timezone
+
+from .counters import recount_recipes, recount_users
+from .feed import backfill_feed
+from .jobs import schedule
+from .models import Recipe, ShoppingCart, Subscribe, User
+from .popularity import WEIGHTS, add_event
+from .shopping_list import add_to_shopping_list
+
+ADDED = "added"
+EXISTS = "exists"
+REMOVED = "removed"
+ABSENT = "absent"
+NOT_FOUND = "not_found"
+SELF = "self"
+
+
+def get_outcomes(ids, found, changed, changed_status, unchanged_status, own=None):
+    outcomes = []
+    for pk in ids:
+        if pk not in found:
+            outcome = NOT_FOUND
+        elif pk == own:
+            outcome = SELF
+        elif pk in changed:
+            outcome = changed_status
+        else:
+            outcome = unchanged_status
+        outcomes.append({"id": pk, "status": outcome})
+    return outcomes
+
+
+def add_links(model, user, field, ids, own=None):
+    found = model._meta.get_field(field).related_model.objects.in_bulk(ids)
+    lookup = f"{field}_id"
+    links = model.objects.filter(user=user, **{f"{lookup}__in": list(found)})
+    existing = set(links.values_list(lookup, flat=True))
+    model.objects.bulk_create(
+        [
+            model(user=user, **{lookup: pk})
+            for pk in found
+            if pk not in existing and pk != own
+        ],
+        ignore_conflicts=True,
+    )
+    # ignore_conflicts leaves no primary keys on the objects, so the rows
+    # added here are the ones that were not there before the insert.
+    added = [pk for pk in links.values_list(lookup, flat=True) if pk not in existing]
+    return found, added
+
+
+def remove_links(model, user, field, ids):
+    found = model._meta.get_field(field).related_model.objects.in_bulk(ids)
+    lookup = f"{field}_id"
+    links = model.objects.filter(user=user, **{f"{lookup}__in": list(found)})
+    removed = set(links.values_list(lookup, flat=True))
+    # Deleting sends post_delete for every row, which keeps the counters,
+    # popularity scores and feeds in sync.
+    links.delete()
+    return found, removed
+
+
+def add_recipes(model, user, ids):
+    with transaction.atomic():
+        found, added = add_links(model, user, "recipe", ids)
+        if added:
+            # bulk_create sends no signals.
+            recount_recipes(Recipe.objects.filter(pk__in=added))
+            add_event(added, WEIGHTS[model], timezone.now())
+            if model is ShoppingCart:
+                add_to_shopping_list(user.pk, added)
+    return get_outcomes(ids, found, set(added), ADDED, EXISTS)
+
+
+def remove_recipes(model, user, ids):
+    with transaction.atomic():
+        found, removed = remove_links(model, user, "recipe", ids)
+    return get_outcomes(ids, found, removed, REMOVED, ABSENT)
+
+
+def clear_shopping_cart(user):
+    with transaction.atomic():
+        return ShoppingCart.objects.filter(user=user).delete()[0]
+
+
+def add_subscriptions(user, ids):
+    with transaction.atomic():
+        found, added = add_links(Subscribe, user, "author", ids, own=user.pk)
+        if added:
+            recount_users(User.objects.filter(pk__in=added))
+            for author_id in added:
+                schedule(backfill_feed, user.pk, author_id)
+    return get_outcomes(ids, found, set(added), ADDED, EXISTS, own=user.pk)
+
+
+def remove_subscriptions(user, ids):
+    with transaction.atomic():
+        found, removed = remove_links(Subscribe, user, "author", ids)
+    return get_outcomes(ids, found, removed, REMOVED, ABSENT)
@@ -0,0 +1,34 @@
+import gzip
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ENCODINGS = ("br", "gzip") if brotli else ("gzip",)
+
+
+def compress(body):
+    variants = {"identity": body, "gzip": gzip.compress(body, mtime=0)}
+    if brotli:
+        variants["br"] = brotli.compress(body)
+    return variants
+
+
+def choose_encoding(accept_encoding):
+    accepted = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+
+    for encoding in ENCODINGS:
+        if accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return "identity"
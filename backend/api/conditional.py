@@ -0,0 +1,131 @@
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.db.models import BooleanField, Exists, Max, OuterRef, Value
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.http import condition
+
+from .models import Favorite, Recipe, ShoppingCart, Subscribe, User
+from .response_cache import INGREDIENTS_VERSION_KEY, get_version
+
+
+def make_etag(*parts):
+    return hashlib.md5(":".join(map(str, parts)).encode()).hexdigest()
+
+
+def per_user_flag(request, queryset):
+    if request.user.is_anonymous:
+        return Value(False, output_field=BooleanField())
+    return Exists(queryset)
+
+
+def recipe_state(request, pk=None, **kwargs):
+    state = (
+        Recipe.objects.filter(pk=pk)
+        .annotate(
+            ingredients_updated_at=Max("ingredients__updated_at"),
+            is_favorited=per_user_flag(
+                request,
+                Favorite.objects.filter(user=request.user.pk, recipe=OuterRef("pk")),
+            ),
+            is_in_shopping_cart=per_user_flag(
+                request,
+                ShoppingCart.objects.filter(
+                    user=request.user.pk, recipe=OuterRef("pk")
+                ),
+            ),
+            is_subscribed=per_user_flag(
+                request,
+                Subscribe.objects.filter(
+                    user=request.user.pk, author=OuterRef("author")
+                ),
+            ),
+        )
+        .values(
+            "pub_date",
+            "updated_at",
+            "author__updated_at",
+            "ingredients_updated_at",
+            "is_favorited",
+            "is_in_shopping_cart",
+            "is_subscribed",
+        )
+        .first()
+    )
+    if state is None:
+        return None
+    timestamps = [
+        state["pub_date"],
+        state["updated_at"],
+        state["author__updated_at"],
+        state["ingredients_updated_at"] or state["pub_date"],
+    ]
+    etag = make_etag(
+        pk,
+        *timestamps,
+        state["is_favorited"],
+        state["is_in_shopping_cart"],
+        state["is_subscribed"],
+    )
+    return etag, max(timestamps)
+
+
+def ingredients_state(request, **kwargs):
+    version = get_version(INGREDIENTS_VERSION_KEY)
+    updated_at = datetime.fromtimestamp(version / 10**9, tz=timezone.utc)
+    return make_etag(version), updated_at
+
+
+def user_state(request, id=None, **kwargs):
+    state = (
+        User.objects.filter(pk=id)
+        .annotate(
+            is_subscribed=per_user_flag(
+                request,
+                Subscribe.objects.filter(user=request.user.pk, author=OuterRef("pk")),
+            )
+        )
+        .values("updated_at", "is_subscribed")
+        .first()
+    )
+    if state is None:
+        return None
+    etag = make_etag(id, state["updated_at"], state["is_subscribed"])
+    return etag, state["updated_at"]
+
+
+def get_cached_state(get_state, request, *args, **kwargs):
+    if not hasattr(request, "_conditional_state"):
+        try:
+            request._conditional_state = get_state(request, *args, **kwargs)
+        except (ValueError, TypeError):
+            request._conditional_state = None
+    return request._conditional_state
+
+
+def conditional(get_state):
+    def etag_func(request, *args, **kwargs):
+        state = get_cached_state(get_state, request, *args, **kwargs)
+        return state and state[0]
+
+    def last_modified_func(request, *args, **kwargs):
+        # Per-user flags have no timestamp, so authenticated clients can only
+        # revalidate with the ETag.
+        if not request.user.is_anonymous:
+            return None
+        state = get_cached_state(get_state, request, *args, **kwargs)
+        return state and state[1]
+
+    def decorator(view):
+        view = condition(etag_func, last_modified_func)(view)
+
+        @wraps(view)
+        def inner(request, *args, **kwargs):
+            response = view(request, *args, **kwargs)
+            patch_vary_headers(response, ("Authorization",))
+            return response
+
+        return inner
+
+    return decorator
@@ -0,0 +1,40 @@
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Favorite, Recipe, ShoppingCart, Subscribe, User
+
+
+def increment(model, pk, field, delta=1):
+    model.objects.filter(pk=pk).update(**{field: F(field) + delta})
+
+
+def count_of(model, field):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef("pk")})
+            .order_by()
+            .values(field)
+            .annotate(count=Count("pk"))
+            .values("count"),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def recount_recipes(queryset=None):
+    if queryset is None:
+        queryset = Recipe.objects.all()
+    return queryset.update(
+        favorites_count=count_of(Favorite, "recipe"),
+        shopping_cart_count=count_of(ShoppingCart, "recipe"),
+    )
+
+
+def recount_users(queryset=None):
+    if queryset is None:
+        queryset = User.objects.all()
+    return queryset.update(
+        recipes_count=count_of(Recipe, "author"),
+        followers_count=count_of(Subscribe, "author"),
+    )
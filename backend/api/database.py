@@ -0,0 +1,67 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from rest_framework.permissions import SAFE_METHODS
+
+# Per-request routing state: None outside requests, otherwise a dict with
+# "replica" (reads may go to a replica) and "written" (stick to primary).
+routing_state = ContextVar("routing_state", default=None)
+
+
+def get_replicas():
+    return [alias for alias in settings.DATABASES if alias.startswith("replica")]
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = routing_state.get()
+        if not state or not state["replica"] or state["written"]:
+            return "default"
+        replicas = get_replicas()
+        return random.choice(replicas) if replicas else "default"
+
+    def db_for_write(self, model, **hints):
+        state = routing_state.get()
+        if state:
+            state["written"] = True
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+
+class ReplicaRoutingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if settings.DB_HEALTH_CHECKS:
+            check_connections()
+        token = routing_state.set({"replica": False, "written": False})
+        try:
+            return self.get_response(request)
+        finally:
+            routing_state.reset(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, "cls", None)
+        name = view_class and f"{view_class.__module__}.{view_class.__name__}"
+        if request.method in SAFE_METHODS and name in settings.REPLICA_READ_VIEWS:
+            routing_state.get()["replica"] = True
+
+
+def check_connections():
+    # Persistent connections may have been dropped by the server while idle.
+    for connection in connections.all():
+        if connection.connection is not None and not connection.is_usable():
+            connection.close()
+
+
+def configure_sqlite(connection):
+    if connection.vendor != "sqlite" or not settings.SQLITE_PERFORMANCE_PROFILE:
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
@@ -0,0 +1,116 @@
+from django.conf import settings
+
+from .models import FeedEntry, Recipe, Subscribe, User
+from .pagination import KeysetPagination
+
+
+def is_fanned_out(author_id):
+    return User.objects.filter(
+        pk=author_id, followers_count__lte=settings.FEED_FANOUT_MAX_FOLLOWERS
+    ).exists()
+
+
+def fan_out_recipe(recipe_id):
+    recipe = Recipe.objects.filter(pk=recipe_id).first()
+    if recipe is None or not is_fanned_out(recipe.author_id):
+        return
+    followers = Subscribe.objects.filter(author_id=recipe.author_id)
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(
+                user_id=user_id,
+                recipe_id=recipe.pk,
+                author_id=recipe.author_id,
+                pub_date=recipe.pub_date,
+            )
+            for user_id in followers.values_list("user_id", flat=True)
+        ),
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+def fan_out_recipes(recipe_ids):
+    recipes = Recipe.objects.filter(
+        pk__in=recipe_ids,
+        author__followers_count__lte=settings.FEED_FANOUT_MAX_FOLLOWERS,
+    ).values_list("id", "author_id", "pub_date")
+    by_author = {}
+    for recipe_id, author_id, pub_date in recipes:
+        by_author.setdefault(author_id, []).append((recipe_id, pub_date))
+    followers = Subscribe.objects.filter(author_id__in=list(by_author))
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(
+                user_id=user_id,
+                recipe_id=recipe_id,
+                author_id=author_id,
+                pub_date=pub_date,
+            )
+            for author_id, user_id in followers.values_list("author_id", "user_id")
+            for recipe_id, pub_date in by_author[author_id]
+        ),
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+def backfill_feed(user_id, author_id):
+    subscribed = Subscribe.objects.filter(user_id=user_id, author_id=author_id)
+    if not subscribed.exists() or not is_fanned_out(author_id):
+        return
+    recipes = (
+        Recipe.objects.filter(author_id=author_id)
+        .order_by("-pub_date", "-id")
+        .values_list("id", "pub_date")[: settings.FEED_BACKFILL_LIMIT]
+    )
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(
+                user_id=user_id,
+                recipe_id=recipe_id,
+                author_id=author_id,
+                pub_date=pub_date,
+            )
+            for recipe_id, pub_date in recipes
+        ),
+        ignore_conflicts=True,
+    )
+
+
+def trim_feed(user_id, author_id):
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def get_feed_ids(user, ordering, position, limit):
+    # Recipe ids that can make up the next `limit` feed entries after
+    # `position`: the first ones from the user's (user, pub_date) index, and
+    # for authors too popular to copy recipes to followers, fan-out on read.
+    pulled = Subscribe.objects.filter(
+        user=user, author__followers_count__gt=settings.FEED_FANOUT_MAX_FOLLOWERS
+    ).values("author_id")
+    sources = (
+        (FeedEntry.objects.filter(user=user), "recipe_id"),
+        (Recipe.objects.filter(author_id__in=pulled), "id"),
+    )
+    ids = []
+    for queryset, id_field in sources:
+        fields = [
+            field.replace("id", id_field) if field.lstrip("-") == "id" else field
+            for field in ordering
+        ]
+        if position is not None:
+            queryset = queryset.filter(
+                KeysetPagination.get_position_filter(fields, position)
+            )
+        ids.extend(queryset.order_by(*fields).values_list(id_field, flat=True)[:limit])
+    return ids
+
+
+class FeedPagination(KeysetPagination):
+    def get_ordering(self, queryset):
+        return ["-pub_date", "-id"]
+
+    def get_page(self, queryset, ordering, position):
+        ids = get_feed_ids(self.request.user, ordering, position, self.page_size + 1)
+        return super().get_page(queryset.filter(id__in=ids), ordering, position)
@@ -1,5 +1,11 @@
 from django_filters import rest_framework as filters
 from .models import Recipe, Ingredient
+from .recipe_index import RankedRecipes, recipe_index
+from .search import search_recipes
+
+
+class NumberInFilter(filters.BaseInFilter, filters.NumberFilter):
+    pass
 
 
 class IngredientFilter(filters.FilterSet):
@@ -13,10 +19,66 @@ class IngredientFilter(filters.FilterSet):
 class RecipeFilter(filters.FilterSet):
     is_favorited = filters.BooleanFilter(method="filter_is_favorited")
     is_in_shopping_cart = filters.BooleanFilter(method="filter_is_in_shopping_cart")
+    search = filters.CharFilter(method="filter_search")
+    ingredients = NumberInFilter(method="filter_ingredients")
+    exclude_ingredients = NumberInFilter(method="filter_ingredients")
+    max_missing = filters.NumberFilter(method="filter_ingredients", min_value=0)
+    ordering = filters.ChoiceFilter(
+        choices=(("popular", "popular"),), method="filter_ordering"
+    )
 
     class Meta:
         model = Recipe
-        fields = ("author", "is_favorited", "is_in_shopping_cart")
+        fields = (
+            "author",
+            "is_favorited",
+            "is_in_shopping_cart",
+            "search",
+            "ingredients",
+            "exclude_ingredients",
+            "max_missing",
+            "ordering",
+        )
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        data = self.form.cleaned_data
+        include = [int(pk) for pk in data.get("ingredients") or ()]
+        exclude = [int(pk) for pk in data.get("exclude_ingredients") or ()]
+        max_missing = data.get("max_missing")
+        if max_missing is not None:
+            max_missing = int(max_missing)
+        elif not include and not exclude:
+            return queryset
+
+        rows = recipe_index.match(include, exclude, max_missing)
+        ordering = list(queryset.query.order_by or Recipe._meta.ordering)
+        if ordering[-1].lstrip("-") != "id":
+            ordering.append("-id" if ordering[-1][0] == "-" else "id")
+        if ordering != ["-pub_date", "-id"] or queryset.query.where:
+            # The index only knows pub_date, so other filters and orderings
+            # are read from the database and joined with the matches here.
+            # pub_date still comes from the index: converting it from SQL
+            # costs more than the query.
+            matches = {
+                recipe_id: (number, pub_date) for number, pub_date, recipe_id in rows
+            }
+            fields = [field.lstrip("-") for field in ordering]
+            read = [field for field in fields if field != "pub_date"]
+            at = fields.index("pub_date") if "pub_date" in fields else len(fields)
+            rows = []
+            for values in queryset.values_list(*read):
+                match = matches.get(values[-1])
+                if match is not None:
+                    number, pub_date = match
+                    pub_date = (pub_date,) if at < len(fields) else ()
+                    rows.append((number, *values[:at], *pub_date, *values[at:]))
+        ranked = ["missing_ingredients", *ordering]
+        if max_missing is None and not include:
+            # Only exclude_ingredients: nothing is missing to rank by.
+            ranked = ranked[1:]
+            rows = [row[1:] for row in rows]
+        return RankedRecipes(queryset, ranked, rows)
 
     def filter_is_favorited(self, queryset, name, value):
         if value and self.request.user.is_authenticated:
@@ -27,3 +89,16 @@ class RecipeFilter(filters.FilterSet):
         if value and self.request.user.is_authenticated:
             return queryset.filter(shopping_cart__user=self.request.user)
         return queryset
+
+    def filter_ordering(self, queryset, name, value):
+        # Filters run in declaration order, so an explicit ordering replaces
+        # the relevance order of search and keeps its matches. Without one,
+        # search results stay ordered by relevance.
+        return queryset.order_by("-popularity_score", "-pub_date", "-id")
+
+    def filter_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
+
+    def filter_ingredients(self, queryset, name, value):
+        # Applied together in filter_queryset.
+        return queryset
@@ -0,0 +1,82 @@
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.utils import timezone
+from PIL import Image, features
+
+from .jobs import submit_on_commit
+from .models import Recipe, User
+from .response_cache import touch_recipes
+
+WEBP_SUPPORTED = features.check("webp")
+
+
+def save_image(storage, name, image, image_format):
+    if image_format == "JPEG" and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    buffer = BytesIO()
+    image.save(buffer, image_format, quality=80)
+    return storage.save(name, ContentFile(buffer.getvalue()))
+
+
+def render_variants(field_file):
+    storage = field_file.storage
+    stem, ext = os.path.splitext(field_file.name)
+    directory, base = os.path.split(stem)
+    with field_file.open("rb"):
+        image = Image.open(field_file)
+        image.load()
+    image_format = image.format or "PNG"
+
+    variants = {
+        "source": field_file.name,
+        "width": image.width,
+        "original": [],
+        "webp": [],
+    }
+    widths = [width for width in settings.IMAGE_VARIANT_WIDTHS if width < image.width]
+    for width in sorted(widths) + [image.width]:
+        resized = image
+        if width != image.width:
+            height = max(round(image.height * width / image.width), 1)
+            resized = image.resize((width, height), Image.LANCZOS)
+            name = f"{directory}/variants/{base}_{width}w{ext}"
+            variants["original"].append(
+                [width, save_image(storage, name, resized, image_format)]
+            )
+        if WEBP_SUPPORTED:
+            name = f"{directory}/variants/{base}_{width}w.webp"
+            variants["webp"].append([width, save_image(storage, name, resized, "WEBP")])
+    return variants
+
+
+def update_variants(model, pk, field, variants_field):
+    instance = model.objects.filter(pk=pk).only(field).first()
+    if instance is None:
+        return False
+    field_file = getattr(instance, field)
+    variants = render_variants(field_file) if field_file else {}
+    # Skip the update if the file was replaced while the variants were built.
+    return model.objects.filter(pk=pk, **{field: field_file.name}).update(
+        **{variants_field: variants, "updated_at": timezone.now()}
+    )
+
+
+def update_recipe_image(pk):
+    if update_variants(Recipe, pk, "image", "image_variants"):
+        touch_recipes([pk])
+
+
+def update_user_avatar(pk):
+    if update_variants(User, pk, "avatar", "avatar_variants"):
+        touch_recipes(Recipe.objects.filter(author_id=pk).values_list("id", flat=True))
+
+
+def schedule_variants(job, instance, field, variants_field):
+    field_file = getattr(instance, field)
+    variants = getattr(instance, variants_field)
+    if (field_file.name or None) == variants.get("source"):
+        return
+    submit_on_commit(job, instance.pk)
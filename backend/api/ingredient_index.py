@@ -0,0 +1,79 @@
+import threading
+from bisect import bisect_left
+
+from rest_framework.renderers import JSONRenderer
+
+from .compression import compress
+from .models import Ingredient
+
+
+class IngredientIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._keys = None
+        self._items = None
+        self._payload = None
+
+    def invalidate(self):
+        with self._lock:
+            self._keys = None
+            self._items = None
+            self._payload = None
+
+    def sync(self, version):
+        with self._lock:
+            if version != self._version:
+                self._version = version
+                self._keys = None
+                self._items = None
+                self._payload = None
+
+    def build(self):
+        catalogue = [
+            {"id": pk, "name": name, "measurement_unit": measurement_unit}
+            for pk, name, measurement_unit in Ingredient.objects.values_list(
+                "id", "name", "measurement_unit"
+            )
+        ]
+        rows = sorted(
+            (item["name"].casefold(), position)
+            for position, item in enumerate(catalogue)
+        )
+        keys = [key for key, _ in rows]
+        items = [catalogue[position] for _, position in rows]
+        return keys, items, catalogue
+
+    def _snapshot(self):
+        with self._lock:
+            if self._keys is None:
+                self._keys, self._items, catalogue = self.build()
+                self._payload = compress(JSONRenderer().render(catalogue))
+            return self._keys, self._items, self._payload
+
+    def payload(self):
+        return self._snapshot()[2]
+
+    def search(self, query, limit=None):
+        keys, items, _ = self._snapshot()
+        query = query.casefold()
+        start = bisect_left(keys, query)
+        end = start
+        while end < len(keys) and keys[end].startswith(query):
+            end += 1
+
+        results = items[start:end]
+        if limit is not None and len(results) >= limit:
+            return results[:limit]
+
+        for position, key in enumerate(keys):
+            if start <= position < end:
+                continue
+            if query in key:
+                results.append(items[position])
+                if limit is not None and len(results) >= limit:
+                    break
+        return results
+
+
+ingredient_index = IngredientIndex()
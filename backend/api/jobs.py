@@ -0,0 +1,168 @@
+import logging
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import (
+    close_old_connections,
+    connection,
+    connections,
+    router,
+    transaction,
+)
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_job_name(func):
+    if isinstance(func, str):
+        return func
+    return f"{func.__module__}.{func.__qualname__}"
+
+
+def enqueue(func, *args, priority=0, delay=0, max_attempts=3, **kwargs):
+    return Job.objects.create(
+        name=get_job_name(func),
+        args=list(args),
+        kwargs=kwargs,
+        priority=priority,
+        max_attempts=max_attempts,
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def enqueue_on_commit(func, *args, **kwargs):
+    transaction.on_commit(lambda: enqueue(func, *args, **kwargs))
+
+
+def schedule(func, *args):
+    if settings.JOB_QUEUE_ENABLED:
+        enqueue_on_commit(func, *args)
+    else:
+        transaction.on_commit(lambda: func(*args))
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.IMAGE_WORKERS, thread_name_prefix="jobs"
+            )
+        return _executor
+
+
+def run_in_worker(func, *args):
+    try:
+        func(*args)
+    except Exception:
+        logger.exception("Background job %s failed", get_job_name(func))
+    finally:
+        connection.close()
+
+
+def submit(func, *args):
+    if settings.JOB_QUEUE_ENABLED:
+        enqueue(func, *args)
+    elif settings.IMAGE_WORKERS:
+        get_executor().submit(run_in_worker, func, *args)
+    else:
+        func(*args)
+
+
+def submit_on_commit(func, *args):
+    transaction.on_commit(lambda: submit(func, *args))
+
+
+def get_ready_jobs(now):
+    # Jobs left running by a worker that died are picked up again after
+    # JOB_TIMEOUT seconds.
+    stale = now - timedelta(seconds=settings.JOB_TIMEOUT)
+    return Job.objects.filter(
+        Q(status=Job.QUEUED, run_at__lte=now)
+        | Q(status=Job.RUNNING, locked_at__lt=stale)
+    ).order_by("-priority", "run_at", "id")
+
+
+def claim(worker):
+    now = timezone.now()
+    claimed = {"status": Job.RUNNING, "locked_by": worker, "locked_at": now}
+    connection = connections[router.db_for_write(Job)]
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic(using=connection.alias):
+            job = get_ready_jobs(now).select_for_update(skip_locked=True).first()
+            if job is None:
+                return None
+            Job.objects.filter(pk=job.pk).update(**claimed)
+    else:
+        # Without SKIP LOCKED the claim is a conditional update that only one
+        # worker can win for a given job.
+        for job in get_ready_jobs(now)[:10]:
+            won = Job.objects.filter(
+                pk=job.pk, status=job.status, locked_at=job.locked_at
+            ).update(**claimed)
+            if won:
+                break
+        else:
+            return None
+
+    for field, value in claimed.items():
+        setattr(job, field, value)
+    return job
+
+
+def run(job):
+    job.attempts += 1
+    try:
+        import_string(job.name)(*job.args, **job.kwargs)
+    except Exception:
+        logger.exception("Job %s failed", job)
+        job.last_error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            backoff = settings.JOB_RETRY_BACKOFF * 2 ** (job.attempts - 1)
+            job.status = Job.QUEUED
+            job.run_at = timezone.now() + timedelta(seconds=backoff)
+        else:
+            job.status = Job.FAILED
+    else:
+        job.status = Job.DONE
+    job.locked_by = ""
+    job.locked_at = None
+    job.save(
+        update_fields=[
+            "attempts",
+            "status",
+            "run_at",
+            "locked_by",
+            "locked_at",
+            "last_error",
+        ]
+    )
+    return job
+
+
+def work(worker, poll_interval=1.0, burst=False, should_stop=None):
+    processed = 0
+    while not (should_stop and should_stop()):
+        close_old_connections()
+        job = claim(worker)
+        if job is None:
+            if burst:
+                break
+            time.sleep(poll_interval)
+            continue
+        run(job)
+        processed += 1
+    return processed
@@ -0,0 +1,49 @@
+from django.db.models import Case, Value, When
+
+# Rows per UPDATE when restoring timestamps. Every row of a CASE is
+# compared in turn, so long ones get slow.
+TIMESTAMP_BATCH_SIZE = 100
+
+
+def create_with_ids(model, objs):
+    objs = model.objects.bulk_create(objs)
+    if objs and objs[0].pk is None:
+        # Backends that do not return ids from bulk inserts. Inside a
+        # transaction the insert holds the write lock until commit, so the
+        # newest rows are these.
+        ids = model.objects.order_by("-pk").values_list("pk", flat=True)
+        for obj, pk in zip(objs, reversed(ids[: len(objs)])):
+            obj.pk = pk
+    return objs
+
+
+def create_with_timestamps(model, objs):
+    # bulk_create sets auto_now and auto_now_add fields to the current time,
+    # so the values given on the objects are written back with an update.
+    fields = [
+        field
+        for field in model._meta.concrete_fields
+        if getattr(field, "auto_now", False) or getattr(field, "auto_now_add", False)
+    ]
+    if not fields:
+        return model.objects.bulk_create(objs)
+    objs = list(objs)
+    values = [[getattr(obj, field.attname) for field in fields] for obj in objs]
+    objs = create_with_ids(model, objs)
+    rows = list(zip(objs, values))
+    for start in range(0, len(rows), TIMESTAMP_BATCH_SIZE):
+        end = start + TIMESTAMP_BATCH_SIZE
+        batch = rows[start:end]
+        model.objects.filter(pk__in=[obj.pk for obj, _ in batch]).update(
+            **{
+                field.attname: Case(
+                    *(When(pk=obj.pk, then=Value(row[index])) for obj, row in batch),
+                    output_field=field,
+                )
+                for index, field in enumerate(fields)
+            }
+        )
+    for obj, row in rows:
+        for field, value in zip(fields, row):
+            setattr(obj, field.attname, value)
+    return objs
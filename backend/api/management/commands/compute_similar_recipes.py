@@ -0,0 +1,26 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.similarity import compute_similar_recipes
+
+
+class Command(BaseCommand):
+    help = "Recalculate similar recipes from ingredient overlap"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--k", type=int, default=settings.SIMILAR_RECIPES_LIMIT)
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        recipes = compute_similar_recipes(
+            max(options["k"], 1), max(options["batch_size"], 1)
+        )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Found similar recipes for {recipes} recipes in {elapsed:.1f}s"
+            )
+        )
@@ -0,0 +1,397 @@
+import time
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+from io import BytesIO
+from itertools import islice
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from PIL import Image
+
+from api.counters import recount_recipes, recount_users
+from api.images import render_variants
+from api.management.bulk import create_with_timestamps
+from api.models import (
+    FeedEntry,
+    Favorite,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCart,
+    Subscribe,
+    User,
+)
+from api.popularity import renormalize
+from api.response_cache import touch_recipes
+from api.shopping_list import rebuild_shopping_lists
+from api.similarity import compute_similar_recipes
+
+DISHES = (
+    "Салат",
+    "Суп",
+    "Паста",
+    "Пирог",
+    "Омлет",
+    "Рагу",
+    "Каша",
+    "Запеканка",
+    "Плов",
+    "Котлеты",
+    "Блины",
+    "Соус",
+)
+AMOUNTS = (1, 2, 3, 5, 10, 20, 50, 100, 150, 200, 250, 300, 500, 1000)
+
+
+def power_law(rng, size, alpha):
+    # Probabilities proportional to 1 / rank ** alpha, with ranks shuffled so
+    # the most active rows are spread over the id range.
+    weights = 1.0 / np.arange(1, size + 1) ** alpha
+    rng.shuffle(weights)
+    return weights / weights.sum()
+
+
+def sample_pairs(rng, count, left, right):
+    # Draws count pairs and drops the repeats, so heavy rows end up with
+    # somewhat fewer links than drawn.
+    first = rng.choice(len(left), size=count, p=left)
+    second = rng.choice(len(right), size=count, p=right)
+    keys = np.unique(first.astype(np.int64) * len(right) + second)
+    return keys // len(right), keys % len(right)
+
+
+def chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+class Command(BaseCommand):
+    help = "Generate a reproducible synthetic dataset for benchmarks"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10000)
+        parser.add_argument("--recipes", type=int, default=50000)
+        parser.add_argument(
+            "--favorites", type=float, default=20, help="Average per user"
+        )
+        parser.add_argument(
+            "--cart", type=float, default=3, help="Average recipes in a cart"
+        )
+        parser.add_argument(
+            "--subscriptions", type=float, default=10, help="Average per user"
+        )
+        parser.add_argument(
+            "--ingredients",
+            type=float,
+            default=8,
+            help="Average ingredients per recipe",
+        )
+        parser.add_argument(
+            "--alpha",
+            type=float,
+            default=1.1,
+            help="Power-law exponent of activity and popularity",
+        )
+        parser.add_argument("--days", type=int, default=365)
+        parser.add_argument(
+            "--end-date",
+            type=datetime.fromisoformat,
+            help="Date of the newest rows, today by default (YYYY-MM-DD)",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--prefix", default="bench")
+        parser.add_argument("--password", default="benchmark-password")
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--similar",
+            action="store_true",
+            help="Also compute similar recipes",
+        )
+
+    def handle(self, *args, **options):
+        ingredient_ids = np.array(
+            Ingredient.objects.order_by("id").values_list("id", flat=True)
+        )
+        if not len(ingredient_ids):
+            raise CommandError("No ingredients, run load_ingredients first")
+        prefix = options["prefix"]
+        if User.objects.filter(username__startswith=prefix).exists():
+            raise CommandError(f"Users named {prefix}* already exist, use --prefix")
+
+        self.rng = np.random.default_rng(options["seed"])
+        self.alpha = options["alpha"]
+        self.batch_size = max(options["batch_size"], 1)
+        end = options["end_date"] or datetime.now()
+        end = datetime(end.year, end.month, end.day, tzinfo=dt_timezone.utc)
+        self.end = end
+        self.start = end - timedelta(days=max(options["days"], 1))
+        self.span = (end - self.start).total_seconds()
+
+        started = time.perf_counter()
+        user_ids = self.step(
+            "users",
+            self.create_users,
+            max(options["users"], 1),
+            prefix,
+            options["password"],
+        )
+        recipe_ids, authors = self.step(
+            "recipes",
+            self.create_recipes,
+            max(options["recipes"], 1),
+            user_ids,
+            ingredient_ids,
+            options["ingredients"],
+        )
+        for model, average in (
+            (Favorite, options["favorites"]),
+            (ShoppingCart, options["cart"]),
+        ):
+            self.step(
+                model._meta.model_name,
+                self.create_links,
+                model,
+                user_ids,
+                recipe_ids,
+                average,
+            )
+        followed = self.step(
+            "subscriptions",
+            self.create_subscriptions,
+            user_ids,
+            options["subscriptions"],
+        )
+
+        self.step("counters", self.recount)
+        self.step("feeds", self.create_feeds, recipe_ids, authors, followed)
+        self.step("popularity", renormalize, self.batch_size)
+        self.step("shopping lists", rebuild_shopping_lists, self.batch_size)
+        if options["similar"]:
+            self.step(
+                "similar recipes",
+                compute_similar_recipes,
+                settings.SIMILAR_RECIPES_LIMIT,
+                500,
+            )
+        touch_recipes([])
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Generated {len(user_ids)} users and {len(recipe_ids)} recipes "
+                f"in {elapsed:.1f}s (seed {options['seed']})"
+            )
+        )
+
+    def step(self, name, func, *args):
+        started = time.perf_counter()
+        result = func(*args)
+        self.stdout.write(f"{name}: {time.perf_counter() - started:.1f}s")
+        return result
+
+    def moments(self, size, after=None):
+        # Sorted moments spread over the range, or for each moment in `after`
+        # a later one before the end of the range.
+        offsets = self.rng.random(size)
+        if after is None:
+            return [
+                self.start + timedelta(seconds=value)
+                for value in np.sort(offsets * self.span).tolist()
+            ]
+        return [
+            moment + (self.end - moment) * value
+            for moment, value in zip(after, offsets.tolist())
+        ]
+
+    def insert(self, model, objs):
+        created = 0
+        for chunk in chunks(objs, self.batch_size):
+            with transaction.atomic():
+                create_with_timestamps(model, chunk)
+            created += len(chunk)
+        return created
+
+    def create_users(self, count, prefix, password):
+        password = make_password(password)
+        joined = self.moments(count)
+        user_ids = []
+        for chunk in chunks(range(count), self.batch_size):
+            with transaction.atomic():
+                users = create_with_timestamps(
+                    User,
+                    [
+                        User(
+                            username=f"{prefix}{index}",
+                            email=f"{prefix}{index}@example.com",
+                            first_name="Имя",
+                            last_name=f"Фамилия {index}",
+                            password=password,
+                            date_joined=joined[index],
+                            updated_at=joined[index],
+                        )
+                        for index in chunk
+                    ],
+                )
+            user_ids.extend(user.pk for user in users)
+        return np.array(user_ids)
+
+    def create_image(self):
+        image = Image.linear_gradient("L").resize((1200, 800)).convert("RGB")
+        buffer = BytesIO()
+        image.save(buffer, "JPEG", quality=80)
+        field = Recipe._meta.get_field("image")
+        name = field.storage.save(
+            field.generate_filename(None, "dataset.jpg"),
+            ContentFile(buffer.getvalue()),
+        )
+        return name, render_variants(Recipe(image=name).image)
+
+    def create_recipes(self, count, user_ids, ingredient_ids, average):
+        # Prolific authors write most recipes and common ingredients appear
+        # in most of them.
+        authors = user_ids[
+            self.rng.choice(
+                len(user_ids),
+                size=count,
+                p=power_law(self.rng, len(user_ids), self.alpha),
+            )
+        ]
+        sizes = np.clip(self.rng.poisson(average - 1, size=count) + 1, 1, 30)
+        drawn = ingredient_ids[
+            self.rng.choice(
+                len(ingredient_ids),
+                size=int(sizes.sum()),
+                p=power_law(self.rng, len(ingredient_ids), self.alpha),
+            )
+        ]
+        amounts = self.rng.choice(AMOUNTS, size=len(drawn))
+        cooking_times = np.clip(self.rng.lognormal(3.3, 0.6, size=count), 1, 600)
+        dishes = self.rng.integers(len(DISHES), size=count)
+        published = self.moments(count)
+        names = dict(Ingredient.objects.values_list("id", "name"))
+        image, variants = self.create_image()
+
+        recipe_ids = []
+        bounds = np.concatenate(([0], np.cumsum(sizes)))
+        for chunk in chunks(range(count), self.batch_size):
+            recipe_ingredients = {}
+            for index in chunk:
+                start, end = bounds[index], bounds[index + 1]
+                items = dict(zip(drawn[start:end].tolist(), amounts[start:end]))
+                recipe_ingredients[index] = items
+            with transaction.atomic():
+                recipes = create_with_timestamps(
+                    Recipe,
+                    [
+                        Recipe(
+                            author_id=int(authors[index]),
+                            name=f"{DISHES[dishes[index]]} {index + 1}",
+                            text=", ".join(
+                                names[pk] for pk in recipe_ingredients[index]
+                            ),
+                            image=image,
+                            image_variants=variants,
+                            cooking_time=int(cooking_times[index]),
+                            pub_date=published[index],
+                            updated_at=published[index],
+                        )
+                        for index in chunk
+                    ],
+                )
+                RecipeIngredient.objects.bulk_create(
+                    RecipeIngredient(
+                        recipe_id=recipe.pk, ingredient_id=pk, amount=int(amount)
+                    )
+                    for recipe, index in zip(recipes, chunk)
+                    for pk, amount in recipe_ingredients[index].items()
+                )
+            recipe_ids.extend(recipe.pk for recipe in recipes)
+        self.published = dict(zip(recipe_ids, published))
+        return np.array(recipe_ids), authors
+
+    def create_links(self, model, user_ids, recipe_ids, average):
+        count = int(len(user_ids) * average)
+        if not count:
+            return 0
+        users, recipes = sample_pairs(
+            self.rng,
+            count,
+            power_law(self.rng, len(user_ids), self.alpha),
+            power_law(self.rng, len(recipe_ids), self.alpha),
+        )
+        recipe_pks = recipe_ids[recipes].tolist()
+        created_at = self.moments(
+            len(recipe_pks), after=[self.published[pk] for pk in recipe_pks]
+        )
+        return self.insert(
+            model,
+            (
+                model(user_id=user_id, recipe_id=recipe_id, created_at=moment)
+                for user_id, recipe_id, moment in zip(
+                    user_ids[users].tolist(), recipe_pks, created_at
+                )
+            ),
+        )
+
+    def create_subscriptions(self, user_ids, average):
+        count = int(len(user_ids) * average)
+        if not count or len(user_ids) < 2:
+            return []
+        followers, authors = sample_pairs(
+            self.rng,
+            count,
+            power_law(self.rng, len(user_ids), self.alpha),
+            power_law(self.rng, len(user_ids), self.alpha),
+        )
+        keep = followers != authors
+        pairs = list(
+            zip(user_ids[followers[keep]].tolist(), user_ids[authors[keep]].tolist())
+        )
+        self.insert(
+            Subscribe,
+            (
+                Subscribe(user_id=user_id, author_id=author_id)
+                for user_id, author_id in pairs
+            ),
+        )
+        return pairs
+
+    def recount(self):
+        with transaction.atomic():
+            recount_recipes()
+            recount_users()
+
+    def create_feeds(self, recipe_ids, authors, subscriptions):
+        # The same rows fan-out and backfill would have written: the latest
+        # FEED_BACKFILL_LIMIT recipes of every followed author who is not too
+        # popular to be read on demand.
+        limit = settings.FEED_BACKFILL_LIMIT
+        pulled = set(
+            User.objects.filter(
+                followers_count__gt=settings.FEED_FANOUT_MAX_FOLLOWERS
+            ).values_list("id", flat=True)
+        )
+        latest = {}
+        for recipe_id, author_id in zip(recipe_ids.tolist(), authors.tolist()):
+            latest.setdefault(author_id, []).append(recipe_id)
+        for author_id, ids in latest.items():
+            latest[author_id] = ids[-limit:]
+        return self.insert(
+            FeedEntry,
+            (
+                FeedEntry(
+                    user_id=user_id,
+                    recipe_id=recipe_id,
+                    author_id=author_id,
+                    pub_date=self.published[recipe_id],
+                )
+                for user_id, author_id in subscriptions
+                if author_id not in pulled
+                for recipe_id in latest.get(author_id, ())
+            ),
+        )
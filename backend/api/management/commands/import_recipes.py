@@ -0,0 +1,366 @@
+import base64
+import binascii
+import json
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from PIL import Image, UnidentifiedImageError
+
+from api.counters import recount_users
+from api.feed import fan_out_recipes
+from api.images import render_variants
+from api.jobs import schedule
+from api.management.bulk import create_with_ids
+from api.models import ImportCheckpoint, Ingredient, Recipe, RecipeIngredient, User
+from api.response_cache import touch_recipes
+
+MAX_SMALL_INTEGER = 32767
+EXTENSIONS = {"JPEG": "jpg", "PNG": "png", "GIF": "gif", "WEBP": "webp"}
+
+
+class InvalidRecord(Exception):
+    pass
+
+
+def read_image(source, images_dir):
+    if source.startswith("data:image"):
+        try:
+            return base64.b64decode(source.split(";base64,", 1)[1], validate=True)
+        except (IndexError, binascii.Error):
+            raise InvalidRecord("invalid base64 image")
+    try:
+        with open(os.path.join(images_dir, source), "rb") as f:
+            return f.read()
+    except OSError as error:
+        raise InvalidRecord(f"cannot read image {source}: {error.strerror}")
+
+
+def store_image(source, images_dir):
+    # Runs in a worker process: decodes and checks the image, saves it to
+    # storage and renders the variants that post_save would otherwise queue.
+    data = read_image(source, images_dir)
+    try:
+        with Image.open(BytesIO(data)) as image:
+            image.verify()
+            image_format = image.format
+    except (UnidentifiedImageError, OSError, SyntaxError):
+        raise InvalidRecord("invalid image")
+    if image_format not in EXTENSIONS:
+        raise InvalidRecord(f"unsupported image format {image_format}")
+
+    field = Recipe._meta.get_field("image")
+    name = field.generate_filename(
+        None, f"{uuid.uuid4().hex}.{EXTENSIONS[image_format]}"
+    )
+    name = field.storage.save(name, ContentFile(data))
+    return name, render_variants(Recipe(image=name).image)
+
+
+def get_int(value, field, maximum=MAX_SMALL_INTEGER):
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise InvalidRecord(f"{field} must be an integer")
+    try:
+        value = int(value)
+    except ValueError:
+        raise InvalidRecord(f"{field} must be an integer")
+    if not 1 <= value <= maximum:
+        raise InvalidRecord(f"{field} must be between 1 and {maximum}")
+    return value
+
+
+class Command(BaseCommand):
+    help = "Import recipes from a JSON Lines file"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument(
+            "--images-dir",
+            default=".",
+            help="Directory that image paths in the file are relative to",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Processes decoding and storing images, 0 to do it inline",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            help="Name of the saved progress used to resume, the full PATH by default",
+        )
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Ignore the checkpoint and import the file from the start",
+        )
+
+    def handle(self, *args, **options):
+        file_path = options["path"]
+        self.images_dir = options["images_dir"]
+        batch_size = max(options["batch_size"], 1)
+        workers = max(options["workers"], 0)
+        self.checkpoint = options["checkpoint"] or os.path.abspath(file_path)
+
+        progress = {"offset": 0, "line": 0, "imported": 0, "skipped": 0}
+        saved = ImportCheckpoint.objects.filter(name=self.checkpoint)
+        saved = saved.values(*progress).first()
+        if not options["restart"] and saved is not None:
+            progress.update(saved)
+            self.stdout.write(
+                f"Resuming from line {progress['line'] + 1} "
+                f"({progress['imported']} recipes already imported)"
+            )
+
+        self.ingredients = {
+            (name, unit): pk
+            for pk, name, unit in Ingredient.objects.values_list(
+                "id", "name", "measurement_unit"
+            )
+        }
+        self.ingredient_ids = set(self.ingredients.values())
+        self.authors = dict(User.objects.values_list("username", "id"))
+
+        # Forked workers must not share the parent's database connections.
+        connections.close_all()
+        pool = None
+        if workers:
+            pool = ProcessPoolExecutor(max_workers=workers, initializer=django.setup)
+
+        started = time.perf_counter()
+        imported = skipped = 0
+        try:
+            with open(file_path, "rb") as f:
+                f.seek(progress["offset"])
+                while True:
+                    lines = []
+                    for line in f:
+                        progress["offset"] += len(line)
+                        progress["line"] += 1
+                        if line.strip():
+                            lines.append((progress["line"], line))
+                        if len(lines) >= batch_size:
+                            break
+                    if not lines:
+                        break
+                    created, invalid = self.import_batch(lines, pool, progress)
+                    imported += created
+                    skipped += invalid
+
+                    elapsed = time.perf_counter() - started
+                    self.stdout.write(
+                        f"Line {progress['line']}: {progress['imported']} recipes "
+                        f"imported, {imported / elapsed:.0f} recipes/sec"
+                    )
+        except FileNotFoundError:
+            raise CommandError(f"File {file_path} not found")
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+
+        elapsed = time.perf_counter() - started
+        rate = imported / elapsed if elapsed else imported
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {imported} recipes in {elapsed:.1f}s "
+                f"({skipped} invalid, {rate:.0f} recipes/sec)"
+            )
+        )
+
+    def save_checkpoint(self, progress):
+        ImportCheckpoint.objects.update_or_create(
+            name=self.checkpoint, defaults=progress
+        )
+
+    def skip(self, line_number, error):
+        self.stderr.write(f"Line {line_number}: {error}")
+
+    def import_batch(self, lines, pool, progress):
+        records = []
+        for line_number, line in lines:
+            try:
+                records.append((line_number, self.parse(line)))
+            except InvalidRecord as error:
+                self.skip(line_number, error)
+        records = self.check_emails(records)
+
+        sources = [(record["image"], self.images_dir) for _, record in records]
+        if pool is None:
+            outcomes = [self.try_store(store_image, *source) for source in sources]
+        else:
+            futures = [pool.submit(store_image, *source) for source in sources]
+            outcomes = [self.try_store(future.result) for future in futures]
+
+        valid = []
+        for (line_number, record), (stored, error) in zip(records, outcomes):
+            if error is not None:
+                self.skip(line_number, error)
+                continue
+            record["image"], record["image_variants"] = stored
+            valid.append(record)
+
+        invalid = len(lines) - len(valid)
+        progress["imported"] += len(valid)
+        progress["skipped"] += invalid
+        # Saved with the batch, so a resumed import neither repeats nor
+        # loses recipes.
+        with transaction.atomic():
+            self.create_recipes(valid)
+            self.save_checkpoint(progress)
+        return len(valid), invalid
+
+    def try_store(self, func, *args):
+        try:
+            return func(*args), None
+        except InvalidRecord as error:
+            return None, error
+
+    def parse(self, line):
+        try:
+            data = json.loads(line)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            raise InvalidRecord("invalid JSON")
+        if not isinstance(data, dict):
+            raise InvalidRecord("expected an object")
+
+        name = data.get("name")
+        text = data.get("text")
+        image = data.get("image")
+        if not isinstance(name, str) or not name.strip() or len(name) > 200:
+            raise InvalidRecord("name must be a string of 1-200 characters")
+        if not isinstance(text, str) or not text.strip():
+            raise InvalidRecord("text is required")
+        if not isinstance(image, str) or not image:
+            raise InvalidRecord("image is required")
+
+        return {
+            "author": self.parse_author(data.get("author")),
+            "name": name.strip(),
+            "text": text,
+            "image": image,
+            "cooking_time": get_int(data.get("cooking_time"), "cooking_time"),
+            "ingredients": self.parse_ingredients(data.get("ingredients")),
+        }
+
+    def parse_author(self, author):
+        if isinstance(author, str):
+            if author not in self.authors:
+                raise InvalidRecord(f"unknown author {author}")
+            return {"username": author}
+        if not isinstance(author, dict) or not author.get("username"):
+            raise InvalidRecord("author must be a username or an object")
+        if author["username"] not in self.authors:
+            email = author.get("email")
+            if not isinstance(email, str) or "@" not in email:
+                raise InvalidRecord(f"new author {author['username']} needs an email")
+            author["email"] = User.objects.normalize_email(email)
+        return author
+
+    def parse_ingredients(self, items):
+        if not isinstance(items, list) or not items:
+            raise InvalidRecord("ingredients must be a non-empty list")
+        amounts = {}
+        for item in items:
+            if not isinstance(item, dict):
+                raise InvalidRecord("ingredient must be an object")
+            if "id" in item:
+                pk = item["id"]
+                if pk not in self.ingredient_ids:
+                    raise InvalidRecord(f"unknown ingredient {pk}")
+            else:
+                key = (item.get("name"), item.get("measurement_unit"))
+                pk = self.ingredients.get(key)
+                if pk is None:
+                    raise InvalidRecord(f"unknown ingredient {key[0]} ({key[1]})")
+            if pk in amounts:
+                raise InvalidRecord(f"ingredient {pk} is listed more than once")
+            amounts[pk] = get_int(item.get("amount"), "amount")
+        return amounts
+
+    def check_emails(self, records):
+        # Emails of new authors must not belong to an existing user or to
+        # another new author earlier in the batch.
+        new = [
+            record["author"]
+            for _, record in records
+            if record["author"]["username"] not in self.authors
+        ]
+        taken = set(
+            User.objects.filter(
+                email__in={author["email"] for author in new}
+            ).values_list("email", flat=True)
+        )
+        owners = {}
+        checked = []
+        for line_number, record in records:
+            author = record["author"]
+            if author["username"] not in self.authors:
+                email = author["email"]
+                owner = owners.setdefault(email, author["username"])
+                if email in taken or owner != author["username"]:
+                    self.skip(line_number, f"email {email} is already in use")
+                    continue
+            checked.append((line_number, record))
+        return checked
+
+    def create_authors(self, records):
+        new = {}
+        for record in records:
+            author = record["author"]
+            if author["username"] not in self.authors:
+                new.setdefault(author["username"], author)
+        if not new:
+            return
+        User.objects.bulk_create(
+            User(
+                username=username,
+                email=author["email"],
+                first_name=author.get("first_name", ""),
+                last_name=author.get("last_name", ""),
+                password=make_password(None),
+            )
+            for username, author in new.items()
+        )
+        self.authors.update(
+            User.objects.filter(username__in=list(new)).values_list("username", "id")
+        )
+
+    def create_recipes(self, records):
+        if not records:
+            return
+        self.create_authors(records)
+        recipes = create_with_ids(
+            Recipe,
+            (
+                Recipe(
+                    author_id=self.authors[record["author"]["username"]],
+                    name=record["name"],
+                    text=record["text"],
+                    image=record["image"],
+                    image_variants=record["image_variants"],
+                    cooking_time=record["cooking_time"],
+                )
+                for record in records
+            ),
+        )
+
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe_id=recipe.pk, ingredient_id=pk, amount=amount)
+            for recipe, record in zip(recipes, records)
+            for pk, amount in record["ingredients"].items()
+        )
+
+        # bulk_create sends no signals.
+        recipe_ids = [recipe.pk for recipe in recipes]
+        author_ids = {recipe.author_id for recipe in recipes}
+        recount_users(User.objects.filter(pk__in=author_ids))
+        schedule(fan_out_recipes, recipe_ids)
+        transaction.on_commit(lambda: touch_recipes([]))
@@ -1,37 +1,149 @@
+import csv
 import json
 import os
+import time
+
 from django.core.management.base import BaseCommand
+from django.db import transaction
+
 from api.models import Ingredient
+from api.response_cache import touch_ingredients
+
+FORMATS = ("json", "csv")
+
+
+def iter_json_array(file, chunk_size=64 * 1024):
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    started = False
+    eof = False
+
+    while True:
+        while position < len(buffer) and (
+            buffer[position].isspace() or (started and buffer[position] == ",")
+        ):
+            position += 1
+
+        if position < len(buffer):
+            if not started:
+                if buffer[position] != "[":
+                    raise json.JSONDecodeError("Expecting '['", buffer, position)
+                started = True
+                position += 1
+                continue
+            if buffer[position] == "]":
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                # A number at the end of the buffer may continue in the next chunk.
+                if end < len(buffer) or eof:
+                    yield item
+                    position = end
+                    continue
+        elif eof:
+            raise json.JSONDecodeError("Unexpected end of data", buffer, position)
+
+        chunk = file.read(chunk_size)
+        eof = not chunk
+        buffer = buffer[position:] + chunk
+        position = 0
+
+
+def iter_json_rows(file):
+    for item in iter_json_array(file):
+        if isinstance(item, dict):
+            yield item.get("name"), item.get("measurement_unit")
+        else:
+            yield None, None
+
+
+def iter_csv_rows(file):
+    for row in csv.reader(file):
+        if len(row) == 2:
+            yield row[0], row[1]
+        elif row:
+            yield None, None
 
 
 class Command(BaseCommand):
-    help = "Load ingredients from JSON file"
+    help = "Load ingredients from JSON or CSV file"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path", default=os.path.join("data", "ingredients.json"))
+        parser.add_argument(
+            "--format",
+            choices=FORMATS,
+            help="File format, detected from the extension by default",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Run the import and roll it back",
+        )
 
     def handle(self, *args, **options):
-        file_path = os.path.join("data", "ingredients.json")
+        file_path = options["path"]
+        file_format = options["format"] or os.path.splitext(file_path)[1][1:]
+        if file_format not in FORMATS:
+            self.stdout.write(
+                self.style.ERROR(f"Unknown format of {file_path}, use --format")
+            )
+            return
+        batch_size = max(options["batch_size"], 1)
+        iter_rows = iter_json_rows if file_format == "json" else iter_csv_rows
 
+        started = time.perf_counter()
         try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                ingredients_data = json.load(f)
-
-            count = 0
-            for item in ingredients_data:
-                if (
-                    isinstance(item, dict)
-                    and "name" in item
-                    and "measurement_unit" in item
-                ):
-                    ingredient, created = Ingredient.objects.get_or_create(
-                        name=item["name"], measurement_unit=item["measurement_unit"]
-                    )
-                    if created:
-                        count += 1
+            with open(file_path, "r", encoding="utf-8", newline="") as f:
+                with transaction.atomic():
+                    before = Ingredient.objects.count()
+                    total, skipped = self.load(iter_rows(f), batch_size)
+                    count = Ingredient.objects.count() - before
+                    # bulk_create sends no signals to bump the version.
+                    transaction.on_commit(touch_ingredients)
+                    if options["dry_run"]:
+                        transaction.set_rollback(True)
 
+        except FileNotFoundError:
+            self.stdout.write(self.style.ERROR(f"File {file_path} not found"))
+            return
+        except (json.JSONDecodeError, UnicodeDecodeError, csv.Error):
             self.stdout.write(
-                self.style.SUCCESS(f"Successfully loaded {count} ingredients")
+                self.style.ERROR(f"Invalid {file_format.upper()} format in {file_path}")
             )
+            return
 
-        except FileNotFoundError:
-            self.stdout.write(self.style.ERROR(f"File {file_path} not found"))
-        except json.JSONDecodeError:
-            self.stdout.write(self.style.ERROR(f"Invalid JSON format in {file_path}"))
+        elapsed = time.perf_counter() - started
+        rate = total / elapsed if elapsed else total
+        prefix = "Dry run: would load" if options["dry_run"] else "Successfully loaded"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{prefix} {count} ingredients "
+                f"({total} rows, {skipped} invalid, {rate:.0f} rows/sec)"
+            )
+        )
+
+    def load(self, rows, batch_size):
+        total = 0
+        skipped = 0
+        batch = []
+        for name, measurement_unit in rows:
+            total += 1
+            if not name or not measurement_unit:
+                skipped += 1
+                continue
+            batch.append(
+                Ingredient(name=name.strip(), measurement_unit=measurement_unit.strip())
+            )
+            if len(batch) >= batch_size:
+                Ingredient.objects.bulk_create(batch, ignore_conflicts=True)
+                batch = []
+        if batch:
+            Ingredient.objects.bulk_create(batch, ignore_conflicts=True)
+        return total, skipped
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api.shopping_list import rebuild_shopping_lists
+
+
+class Command(BaseCommand):
+    help = "Rebuild aggregated shopping lists from shopping carts"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        items = rebuild_shopping_lists(max(options["batch_size"], 1))
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {items} shopping list items"))
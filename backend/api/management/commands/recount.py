@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.counters import recount_recipes, recount_users
+
+
+class Command(BaseCommand):
+    help = "Recalculate denormalized recipe and user counters"
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            recipes = recount_recipes()
+            users = recount_users()
+        self.stdout.write(
+            self.style.SUCCESS(f"Recounted {recipes} recipes and {users} users")
+        )
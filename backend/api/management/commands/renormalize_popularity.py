@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from api.popularity import renormalize
+
+
+class Command(BaseCommand):
+    help = "Recalculate recipe popularity scores from favorites and shopping carts"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        recipes = renormalize(max(options["batch_size"], 1))
+        self.stdout.write(
+            self.style.SUCCESS(f"Recalculated popularity of {recipes} recipes")
+        )
@@ -0,0 +1,70 @@
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from api.jobs import work
+
+
+class Command(BaseCommand):
+    help = "Run background jobs from the database queue"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=2)
+        parser.add_argument("--pool", choices=("thread", "process"), default="thread")
+        parser.add_argument("--poll-interval", type=float, default=1.0)
+        parser.add_argument(
+            "--burst",
+            action="store_true",
+            help="Exit once the queue is empty",
+        )
+
+    def handle(self, *args, **options):
+        concurrency = max(options["concurrency"], 1)
+        if options["pool"] == "process":
+            stop = multiprocessing.Manager().Event()
+            executor_class = ProcessPoolExecutor
+            # Forked workers must not share the parent's database connections.
+            connections.close_all()
+        else:
+            stop = threading.Event()
+            executor_class = ThreadPoolExecutor
+
+        def shutdown(signum, frame):
+            stop.set()
+
+        signal.signal(signal.SIGINT, shutdown)
+        signal.signal(signal.SIGTERM, shutdown)
+
+        prefix = f"{socket.gethostname()}:{os.getpid()}"
+        started = time.perf_counter()
+        with executor_class(max_workers=concurrency) as executor:
+            futures = [
+                executor.submit(
+                    run_worker,
+                    f"{prefix}:{number}",
+                    options["poll_interval"],
+                    options["burst"],
+                    stop,
+                )
+                for number in range(concurrency)
+            ]
+            processed = sum(future.result() for future in futures)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(f"Processed {processed} jobs in {elapsed:.1f}s")
+        )
+
+
+def run_worker(name, poll_interval, burst, stop):
+    try:
+        return work(name, poll_interval, burst, should_stop=stop.is_set)
+    finally:
+        connections.close_all()
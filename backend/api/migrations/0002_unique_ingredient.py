@@ -0,0 +1,42 @@
+# Generated by Django 3.2.3 on 2026-10-17 06:49
+
+from django.db import migrations, models
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    Ingredient = apps.get_model("api", "Ingredient")
+    RecipeIngredient = apps.get_model("api", "RecipeIngredient")
+
+    kept = {}
+    for ingredient in Ingredient.objects.order_by("id"):
+        key = (ingredient.name, ingredient.measurement_unit)
+        if key not in kept:
+            kept[key] = ingredient.id
+            continue
+        target_id = kept[key]
+        for row in RecipeIngredient.objects.filter(ingredient_id=ingredient.id):
+            if RecipeIngredient.objects.filter(
+                recipe_id=row.recipe_id, ingredient_id=target_id
+            ).exists():
+                row.delete()
+            else:
+                row.ingredient_id = target_id
+                row.save(update_fields=["ingredient"])
+        ingredient.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_ingredients, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="ingredient",
+            constraint=models.UniqueConstraint(
+                fields=("name", "measurement_unit"), name="unique_ingredient"
+            ),
+        ),
+    ]
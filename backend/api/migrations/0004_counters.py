@@ -0,0 +1,71 @@
+# Generated by Django 3.2.3 on 2026-10-17 06:51
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_of(model, field):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef("pk")})
+            .order_by()
+            .values(field)
+            .annotate(count=Count("pk"))
+            .values("count"),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model("api", "Recipe")
+    User = apps.get_model("api", "User")
+    Recipe.objects.update(
+        favorites_count=count_of(apps.get_model("api", "Favorite"), "recipe"),
+        shopping_cart_count=count_of(apps.get_model("api", "ShoppingCart"), "recipe"),
+    )
+    User.objects.update(
+        recipes_count=count_of(Recipe, "author"),
+        followers_count=count_of(apps.get_model("api", "Subscribe"), "author"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0003_recipe_pub_date_id_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="favorites_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="В избранном"
+            ),
+        ),
+        migrations.AddField(
+            model_name="recipe",
+            name="shopping_cart_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="В списках покупок"
+            ),
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="followers_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="Количество подписчиков"
+            ),
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="recipes_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="Количество рецептов"
+            ),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 3.2.3 on 2026-10-17 06:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0005_updated_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="image_variants",
+            field=models.JSONField(
+                default=dict, editable=False, verbose_name="Уменьшенные копии картинки"
+            ),
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="avatar_variants",
+            field=models.JSONField(
+                default=dict, editable=False, verbose_name="Уменьшенные копии аватара"
+            ),
+        ),
+    ]
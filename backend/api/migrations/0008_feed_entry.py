@@ -0,0 +1,80 @@
+# Generated by Django 3.2.3 on 2026-10-17 07:09
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_feeds(apps, schema_editor):
+    FeedEntry = apps.get_model("api", "FeedEntry")
+    Recipe = apps.get_model("api", "Recipe")
+    Subscribe = apps.get_model("api", "Subscribe")
+    for user_id, author_id in Subscribe.objects.values_list("user_id", "author_id"):
+        recipe_ids = (
+            Recipe.objects.filter(author_id=author_id)
+            .order_by("-pub_date", "-id")
+            .values_list("id", flat=True)[: settings.FEED_BACKFILL_LIMIT]
+        )
+        FeedEntry.objects.bulk_create(
+            FeedEntry(user_id=user_id, recipe_id=recipe_id, author_id=author_id)
+            for recipe_id in recipe_ids
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0007_job"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FeedEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "author",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "recipe",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="feed_entries",
+                        to="api.recipe",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="feed_entries",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Запись ленты",
+                "verbose_name_plural": "Записи лент",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="feedentry",
+            constraint=models.UniqueConstraint(
+                fields=("user", "recipe"), name="unique_feed_entry"
+            ),
+        ),
+        migrations.RunPython(fill_feeds, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 3.2.3 on 2026-10-17 07:15
+
+import math
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.db import migrations, models
+import django.utils.timezone
+
+# Same scoring as api.popularity at the time of this migration.
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+WEIGHTS = {"Favorite": 1.0, "ShoppingCart": 2.0}
+
+
+def fill_popularity(apps, schema_editor):
+    rate = math.log(2) / (settings.POPULARITY_HALF_LIFE_HOURS * 3600)
+    scores = {}
+    for model_name, weight in WEIGHTS.items():
+        model = apps.get_model("api", model_name)
+        for recipe_id, created_at in model.objects.values_list(
+            "recipe_id", "created_at"
+        ):
+            term = math.log(weight) + rate * (created_at - EPOCH).total_seconds()
+            if recipe_id in scores:
+                high, low = sorted((scores[recipe_id], term), reverse=True)
+                term = high + math.log1p(math.exp(low - high))
+            scores[recipe_id] = term
+    Recipe = apps.get_model("api", "Recipe")
+    Recipe.objects.bulk_update(
+        [Recipe(pk=pk, popularity_score=score) for pk, score in scores.items()],
+        ["popularity_score"],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0009_similar_recipe"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="favorite",
+            name="created_at",
+            field=models.DateTimeField(
+                auto_now_add=True,
+                default=django.utils.timezone.now,
+                verbose_name="Дата добавления",
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="recipe",
+            name="popularity_score",
+            field=models.FloatField(
+                default=0, editable=False, verbose_name="Популярность"
+            ),
+        ),
+        migrations.AddField(
+            model_name="shoppingcart",
+            name="created_at",
+            field=models.DateTimeField(
+                auto_now_add=True,
+                default=django.utils.timezone.now,
+                verbose_name="Дата добавления",
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(
+                fields=["-popularity_score", "-pub_date", "-id"],
+                name="recipe_popularity_idx",
+            ),
+        ),
+        migrations.RunPython(fill_popularity, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 3.2.3 on 2026-10-17 07:18
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_shopping_lists(apps, schema_editor):
+    RecipeIngredient = apps.get_model("api", "RecipeIngredient")
+    ShoppingListItem = apps.get_model("api", "ShoppingListItem")
+    rows = (
+        RecipeIngredient.objects.filter(recipe__shopping_cart__isnull=False)
+        .order_by()
+        .values("recipe__shopping_cart__user_id", "ingredient_id")
+        .annotate(total=models.Sum("amount"))
+        .values_list("recipe__shopping_cart__user_id", "ingredient_id", "total")
+    )
+    ShoppingListItem.objects.bulk_create(
+        (
+            ShoppingListItem(
+                user_id=user_id, ingredient_id=ingredient_id, total_amount=total
+            )
+            for user_id, ingredient_id, total in rows
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0010_popularity_score"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ShoppingListItem",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "total_amount",
+                    models.PositiveIntegerField(default=0, verbose_name="Количество"),
+                ),
+                (
+                    "ingredient",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="api.ingredient"
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="shopping_list_items",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Позиция списка покупок",
+                "verbose_name_plural": "Позиции списков покупок",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="shoppinglistitem",
+            constraint=models.UniqueConstraint(
+                fields=("user", "ingredient"), name="unique_shopping_list_item"
+            ),
+        ),
+        migrations.RunPython(fill_shopping_lists, migrations.RunPython.noop),
+    ]
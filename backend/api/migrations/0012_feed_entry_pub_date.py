@@ -0,0 +1,39 @@
+# Generated by Django 3.2.3 on 2026-10-17 07:55
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+def fill_pub_dates(apps, schema_editor):
+    FeedEntry = apps.get_model("api", "FeedEntry")
+    Recipe = apps.get_model("api", "Recipe")
+    FeedEntry.objects.update(
+        pub_date=models.Subquery(
+            Recipe.objects.filter(pk=models.OuterRef("recipe_id")).values("pub_date")
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0011_shopping_list_item"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="feedentry",
+            name="pub_date",
+            field=models.DateTimeField(
+                default=django.utils.timezone.now, verbose_name="Дата публикации"
+            ),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_pub_dates, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="feedentry",
+            index=models.Index(
+                fields=["user", "-pub_date", "-recipe"], name="feed_user_pub_date_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 3.2.3 on 2026-10-17 07:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0012_feed_entry_pub_date"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ImportCheckpoint",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "name",
+                    models.CharField(
+                        max_length=255, unique=True, verbose_name="Импорт"
+                    ),
+                ),
+                (
+                    "offset",
+                    models.PositiveBigIntegerField(default=0, verbose_name="Смещение"),
+                ),
+                ("line", models.PositiveIntegerField(default=0, verbose_name="Строка")),
+                (
+                    "imported",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Импортировано"
+                    ),
+                ),
+                (
+                    "skipped",
+                    models.PositiveIntegerField(default=0, verbose_name="Пропущено"),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="Обновлён"),
+                ),
+            ],
+            options={
+                "verbose_name": "Прогресс импорта",
+                "verbose_name_plural": "Прогресс импортов",
+            },
+        ),
+    ]
@@ -3,11 +3,37 @@ from django.core.validators import MinValueValidator
 from django.contrib.auth.models import AbstractUser
 
 
-class User(AbstractUser):
+class DerivedFieldsMixin:
+    derived_fields = ()
+
+    def save(self, *args, **kwargs):
+        # Derived fields are maintained with queryset updates, so a regular
+        # save must not write back the possibly stale values loaded with the
+        # instance.
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.derived_fields
+            ]
+        super().save(*args, **kwargs)
+
+
+class User(DerivedFieldsMixin, AbstractUser):
     email = models.EmailField("email address", unique=True, blank=False, null=False)
     avatar = models.ImageField(
         upload_to="avatars/", blank=True, null=True, verbose_name="Аватар"
     )
+    recipes_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name="Количество рецептов"
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name="Количество подписчиков"
+    )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата изменения")
+    avatar_variants = models.JSONField(
+        default=dict, editable=False, verbose_name="Уменьшенные копии аватара"
+    )
     groups = models.ManyToManyField(
         "auth.Group",
         verbose_name="groups",
@@ -25,6 +51,8 @@ class User(AbstractUser):
         related_query_name="user",
     )
 
+    derived_fields = ("recipes_count", "followers_count", "avatar_variants")
+
     class Meta:
         verbose_name = "Пользователь"
         verbose_name_plural = "Пользователи"
@@ -38,17 +66,23 @@ class Ingredient(models.Model):
     measurement_unit = models.CharField(
         max_length=200, verbose_name="Единица измерения"
     )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата изменения")
 
     class Meta:
         verbose_name = "Ингредиент"
         verbose_name_plural = "Ингредиенты"
         ordering = ["name"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["name", "measurement_unit"], name="unique_ingredient"
+            )
+        ]
 
     def __str__(self):
         return f"{self.name}, {self.measurement_unit}"
 
 
-class Recipe(models.Model):
+class Recipe(DerivedFieldsMixin, models.Model):
     author = models.ForeignKey(
         User,
         related_name="recipes",
@@ -66,11 +100,38 @@ class Recipe(models.Model):
         verbose_name="Время приготовления (в минутах)",
     )
     pub_date = models.DateTimeField(auto_now_add=True, verbose_name="Дата публикации")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата изменения")
+    favorites_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name="В избранном"
+    )
+    shopping_cart_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name="В списках покупок"
+    )
+    image_variants = models.JSONField(
+        default=dict, editable=False, verbose_name="Уменьшенные копии картинки"
+    )
+    popularity_score = models.FloatField(
+        default=0, editable=False, verbose_name="Популярность"
+    )
+
+    derived_fields = (
+        "favorites_count",
+        "shopping_cart_count",
+        "image_variants",
+        "popularity_score",
+    )
 
     class Meta:
         verbose_name = "Рецепт"
         verbose_name_plural = "Рецепты"
         ordering = ["-pub_date"]
+        indexes = [
+            models.Index(fields=["-pub_date", "-id"], name="recipe_pub_date_id_idx"),
+            models.Index(
+                fields=["-popularity_score", "-pub_date", "-id"],
+                name="recipe_popularity_idx",
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -100,6 +161,7 @@ class Favorite(models.Model):
     recipe = models.ForeignKey(
         Recipe, on_delete=models.CASCADE, related_name="favorites"
     )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата добавления")
 
     class Meta:
         verbose_name = "Избранное"
@@ -116,6 +178,7 @@ class ShoppingCart(models.Model):
     recipe = models.ForeignKey(
         Recipe, on_delete=models.CASCADE, related_name="shopping_cart"
     )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата добавления")
 
     class Meta:
         verbose_name = "Список покупок"
@@ -127,6 +190,23 @@ class ShoppingCart(models.Model):
         ]
 
 
+class ShoppingListItem(models.Model):
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="shopping_list_items"
+    )
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE)
+    total_amount = models.PositiveIntegerField(default=0, verbose_name="Количество")
+
+    class Meta:
+        verbose_name = "Позиция списка покупок"
+        verbose_name_plural = "Позиции списков покупок"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "ingredient"], name="unique_shopping_list_item"
+            )
+        ]
+
+
 class Subscribe(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="follower")
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name="following")
@@ -142,3 +222,103 @@ class Subscribe(models.Model):
                 check=~models.Q(user=models.F("author")), name="prevent_self_subscribe"
             ),
         ]
+
+
+class FeedEntry(models.Model):
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="feed_entries"
+    )
+    recipe = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE, related_name="feed_entries"
+    )
+    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    # Copy of the recipe's pub_date, so a feed page is read from one index.
+    pub_date = models.DateTimeField(verbose_name="Дата публикации")
+
+    class Meta:
+        verbose_name = "Запись ленты"
+        verbose_name_plural = "Записи лент"
+        constraints = [
+            models.UniqueConstraint(fields=["user", "recipe"], name="unique_feed_entry")
+        ]
+        indexes = [
+            models.Index(
+                fields=["user", "-pub_date", "-recipe"], name="feed_user_pub_date_idx"
+            )
+        ]
+
+
+class SimilarRecipe(models.Model):
+    recipe = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE, related_name="similar_entries"
+    )
+    similar = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name="+")
+    score = models.FloatField(verbose_name="Сходство")
+
+    class Meta:
+        verbose_name = "Похожий рецепт"
+        verbose_name_plural = "Похожие рецепты"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["recipe", "similar"], name="unique_similar_recipe"
+            )
+        ]
+        indexes = [
+            models.Index(fields=["recipe", "-score"], name="similar_recipe_score_idx")
+        ]
+
+
+class Job(models.Model):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUSES = (
+        (QUEUED, "В очереди"),
+        (RUNNING, "Выполняется"),
+        (DONE, "Выполнена"),
+        (FAILED, "Ошибка"),
+    )
+
+    name = models.CharField(max_length=200, verbose_name="Функция")
+    args = models.JSONField(default=list, verbose_name="Аргументы")
+    kwargs = models.JSONField(default=dict, verbose_name="Именованные аргументы")
+    status = models.CharField(
+        max_length=16, choices=STATUSES, default=QUEUED, verbose_name="Статус"
+    )
+    priority = models.SmallIntegerField(default=0, verbose_name="Приоритет")
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name="Попытки")
+    max_attempts = models.PositiveSmallIntegerField(
+        default=3, verbose_name="Максимум попыток"
+    )
+    run_at = models.DateTimeField(verbose_name="Запустить после")
+    locked_by = models.CharField(max_length=100, blank=True, verbose_name="Воркер")
+    locked_at = models.DateTimeField(null=True, blank=True, verbose_name="Взята")
+    last_error = models.TextField(blank=True, verbose_name="Последняя ошибка")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Создана")
+
+    class Meta:
+        verbose_name = "Фоновая задача"
+        verbose_name_plural = "Фоновые задачи"
+        indexes = [
+            models.Index(fields=["status", "-priority", "run_at"], name="job_queue_idx")
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.status})"
+
+
+class ImportCheckpoint(models.Model):
+    name = models.CharField(max_length=255, unique=True, verbose_name="Импорт")
+    offset = models.PositiveBigIntegerField(default=0, verbose_name="Смещение")
+    line = models.PositiveIntegerField(default=0, verbose_name="Строка")
+    imported = models.PositiveIntegerField(default=0, verbose_name="Импортировано")
+    skipped = models.PositiveIntegerField(default=0, verbose_name="Пропущено")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Обновлён")
+
+    class Meta:
+        verbose_name = "Прогресс импорта"
+        verbose_name_plural = "Прогресс импортов"
+
+    def __str__(self):
+        return f"{self.name} ({self.line})"
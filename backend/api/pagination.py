@@ -1,7 +1,171 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .recipe_index import RankedRecipes
+
+
+class KeysetPagination(BasePagination):
+    cursor_query_param = "cursor"
+    page_size_query_param = "limit"
+    page_size = 6
+    max_page_size = 100
+    invalid_cursor_message = "Неверный курсор."
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_ordering(self, queryset):
+        if isinstance(queryset, RankedRecipes):
+            return queryset.ordering
+        ordering = list(queryset.query.order_by or queryset.model._meta.ordering)
+        if not any(field.lstrip("-") in ("id", "pk") for field in ordering):
+            descending = bool(ordering) and ordering[-1].startswith("-")
+            ordering.append("-id" if descending else "id")
+        return ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(queryset)
+        position, reverse = self.decode_cursor(request, queryset.model)
+
+        ordering = self.ordering
+        if reverse:
+            ordering = [self.reverse_field(field) for field in ordering]
+        results = self.get_page(queryset, ordering, position)
+        has_more = len(results) > self.page_size
+        results = results[: self.page_size]
+        if reverse:
+            results.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+
+        self.page = results
+        return results
+
+    def get_page(self, queryset, ordering, position):
+        if isinstance(queryset, RankedRecipes):
+            return queryset.get_page(ordering, position, self.page_size + 1)
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.get_position_filter(ordering, position))
+        return list(queryset[: self.page_size + 1])
+
+    @staticmethod
+    def reverse_field(field):
+        return field[1:] if field.startswith("-") else "-" + field
+
+    @staticmethod
+    def get_position_filter(ordering, position):
+        condition = Q()
+        equal = Q()
+        for field, value in zip(ordering, position):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            condition |= equal & Q(**{f"{name}__{lookup}": value})
+            equal &= Q(**{name: value})
+        # Implied by the condition, but without it the OR hides the range on
+        # the first field and the database scans the index from its start.
+        name = ordering[0].lstrip("-")
+        lookup = "lte" if ordering[0].startswith("-") else "gte"
+        return Q(**{f"{name}__{lookup}": position[0]}) & condition
+
+    def get_position(self, instance):
+        position = []
+        for field in self.ordering:
+            value = getattr(instance, field.lstrip("-"))
+            # Annotations such as search_rank keep their JSON type.
+            position.append(value if isinstance(value, (int, float)) else str(value))
+        return position
+
+    @staticmethod
+    def to_python(model, field, value):
+        try:
+            return model._meta.get_field(field).to_python(value)
+        except FieldDoesNotExist:
+            if not isinstance(value, (int, float)):
+                raise ValueError
+            return value
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            tokens = json.loads(urlsafe_b64decode(encoded.encode("ascii")))
+            values = tokens["p"]
+            if len(values) != len(self.ordering):
+                raise ValueError
+            position = [
+                self.to_python(model, field.lstrip("-"), value)
+                for field, value in zip(self.ordering, values)
+            ]
+            return position, bool(tokens.get("r"))
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, instance, reverse):
+        tokens = {"p": self.get_position(instance)}
+        if reverse:
+            tokens["r"] = 1
+        encoded = urlsafe_b64encode(json.dumps(tokens).encode("ascii"))
+        url = remove_query_param(self.base_url, "page")
+        return replace_query_param(url, self.cursor_query_param, encoded.decode())
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return replace_query_param(self.base_url, self.cursor_query_param, "")
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(
+            OrderedDict(
+                [
+                    ("next", self.get_next_link()),
+                    ("previous", self.get_previous_link()),
+                    ("results", data),
+                ]
+            )
+        )
 
 
 class CustomPagination(PageNumberPagination):
     page_size_query_param = "limit"
     page_size = 6
     max_page_size = 100
+    keyset_class = KeysetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.keyset_class.cursor_query_param in request.query_params:
+            self.keyset = self.keyset_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
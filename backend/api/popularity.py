@@ -0,0 +1,85 @@
+import math
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, FloatField, Value, When
+from django.db.models.functions import Abs, Exp, Greatest, Ln
+
+from .models import Favorite, Recipe, ShoppingCart
+
+# popularity_score is ln(sum of weight * exp(rate * (added_at - EPOCH))) over
+# a recipe's favorites and cart additions. Every term would be decayed by the
+# same factor at any later moment, so ordering by the stored value is
+# ordering by decayed popularity, and the logarithm keeps the growing
+# exponents in range. Weights are at least 1 and EPOCH is in the past, so
+# real scores are positive and 0 means no activity.
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+WEIGHTS = {Favorite: 1.0, ShoppingCart: 2.0}
+
+
+def get_decay_rate():
+    return math.log(2) / (settings.POPULARITY_HALF_LIFE_HOURS * 3600)
+
+
+def get_term(weight, moment):
+    return math.log(weight) + get_decay_rate() * (moment - EPOCH).total_seconds()
+
+
+def log_add(first, second):
+    high, low = max(first, second), min(first, second)
+    return high + math.log1p(math.exp(low - high))
+
+
+def add_event(recipe_ids, weight, moment):
+    term = Value(get_term(weight, moment), output_field=FloatField())
+    score = F("popularity_score")
+    Recipe.objects.filter(pk__in=recipe_ids).update(
+        popularity_score=Case(
+            When(popularity_score__lte=0, then=term),
+            default=Greatest(score, term) + Ln(1.0 + Exp(-Abs(score - term))),
+            output_field=FloatField(),
+        )
+    )
+
+
+def remove_event(recipe_id, weight, moment):
+    term = get_term(weight, moment)
+    score = F("popularity_score")
+    # Subtracting the last term leaves rounding noise, so scores that close to
+    # the removed term drop to zero.
+    Recipe.objects.filter(pk=recipe_id).update(
+        popularity_score=Case(
+            When(
+                popularity_score__gt=term + 1e-6,
+                then=Greatest(score + Ln(1.0 - Exp(term - score)), Value(0.0)),
+            ),
+            default=Value(0.0),
+            output_field=FloatField(),
+        )
+    )
+
+
+def compute_scores():
+    scores = {}
+    for model, weight in WEIGHTS.items():
+        rows = model.objects.values_list("recipe_id", "created_at")
+        for recipe_id, created_at in rows.iterator():
+            term = get_term(weight, created_at)
+            score = scores.get(recipe_id)
+            scores[recipe_id] = term if score is None else log_add(score, term)
+    return scores
+
+
+def renormalize(batch_size=1000):
+    # Recomputes every score from the rows, dropping the rounding error that
+    # incremental updates accumulate and applying a changed half-life.
+    scores = compute_scores()
+    with transaction.atomic():
+        Recipe.objects.exclude(popularity_score=0).update(popularity_score=0)
+        Recipe.objects.bulk_update(
+            [Recipe(pk=pk, popularity_score=score) for pk, score in scores.items()],
+            ["popularity_score"],
+            batch_size=batch_size,
+        )
+    return len(scores)
@@ -0,0 +1,221 @@
+import threading
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter
+from datetime import timedelta
+from operator import itemgetter
+
+from django.db.models import Count, Max
+
+from .models import Recipe, RecipeIngredient
+
+# Writes committed by other workers are found by updated_at; re-reading
+# recipes changed a little before the last seen change also catches
+# transactions that committed out of order.
+SYNC_OVERLAP = timedelta(seconds=30)
+
+
+class RecipeIngredientIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # ingredient id -> sorted array of recipe ids
+        self._postings = None
+        # recipe id -> ingredient ids
+        self._recipes = None
+        # recipe id -> pub_date, the default order of ranked matches
+        self._published = None
+        self._updated_at = None
+
+    def invalidate(self):
+        with self._lock:
+            self._postings = None
+            self._recipes = None
+            self._published = None
+
+    def build(self):
+        postings = {}
+        published = dict(Recipe.objects.values_list("id", "pub_date"))
+        recipes = dict.fromkeys(published, ())
+        rows = RecipeIngredient.objects.order_by("ingredient_id", "recipe_id")
+        for recipe_id, ingredient_id in rows.values_list("recipe_id", "ingredient_id"):
+            postings.setdefault(ingredient_id, array("q")).append(recipe_id)
+            recipes[recipe_id] = recipes.get(recipe_id, ()) + (ingredient_id,)
+        return postings, recipes, published
+
+    def sync(self):
+        state = Recipe.objects.aggregate(
+            count=Count("id"), updated_at=Max("updated_at")
+        )
+        with self._lock:
+            if self._postings is not None and state["updated_at"] != self._updated_at:
+                if self._updated_at is None:
+                    self._postings = None
+                else:
+                    self._catch_up(self._updated_at - SYNC_OVERLAP)
+            # A deleted recipe leaves no trace to catch up from.
+            if self._postings is None or len(self._recipes) != state["count"]:
+                self._postings, self._recipes, self._published = self.build()
+            self._updated_at = state["updated_at"]
+
+    def _catch_up(self, since):
+        changed = Recipe.objects.filter(updated_at__gte=since)
+        published = dict(changed.values_list("id", "pub_date"))
+        ingredients = {pk: [] for pk in published}
+        rows = RecipeIngredient.objects.filter(recipe__in=changed)
+        for recipe_id, ingredient_id in rows.values_list("recipe_id", "ingredient_id"):
+            ingredients[recipe_id].append(ingredient_id)
+        for recipe_id, ingredient_ids in ingredients.items():
+            self._replace(recipe_id, ingredient_ids, published[recipe_id])
+
+    def _replace(self, recipe_id, ingredient_ids, pub_date=None):
+        for ingredient_id in self._recipes.pop(recipe_id, ()):
+            recipe_ids = self._postings[ingredient_id]
+            recipe_ids.pop(bisect_left(recipe_ids, recipe_id))
+        if ingredient_ids is None:
+            self._published.pop(recipe_id, None)
+            return
+        for ingredient_id in ingredient_ids:
+            insort(self._postings.setdefault(ingredient_id, array("q")), recipe_id)
+        self._recipes[recipe_id] = tuple(ingredient_ids)
+        if pub_date is not None:
+            self._published[recipe_id] = pub_date
+
+    def update(self, recipe_id, ingredient_ids, pub_date=None):
+        with self._lock:
+            if self._postings is not None:
+                self._replace(recipe_id, ingredient_ids, pub_date)
+
+    def remove(self, recipe_id):
+        self.update(recipe_id, None)
+
+    def _containing_any(self, ingredient_ids):
+        found = set()
+        for ingredient_id in ingredient_ids:
+            found.update(self._postings.get(ingredient_id, ()))
+        return found
+
+    def related(self, recipe_id):
+        # The recipe's ingredients, the ingredients of every recipe sharing one
+        # with it, document frequencies of all of them and the recipe count.
+        self.sync()
+        with self._lock:
+            ingredient_ids = self._recipes.get(recipe_id, ())
+            neighbours = {
+                pk: self._recipes[pk]
+                for pk in self._containing_any(ingredient_ids)
+                if pk != recipe_id
+            }
+            frequencies = {
+                ingredient_id: len(self._postings[ingredient_id])
+                for ids in (ingredient_ids, *neighbours.values())
+                for ingredient_id in ids
+            }
+            return ingredient_ids, neighbours, frequencies, len(self._recipes)
+
+    def match(self, include=(), exclude=(), max_missing=None):
+        # Returns (missing, pub_date, recipe id) rows, where missing is the
+        # number of the recipe's ingredients not in `include`. Without
+        # max_missing every ingredient in `include` is required, and with
+        # neither every recipe not excluded matches.
+        self.sync()
+        include = set(include)
+        with self._lock:
+            excluded = self._containing_any(exclude)
+            if max_missing is None and include:
+                postings = sorted(
+                    (self._postings.get(pk, ()) for pk in include), key=len
+                )
+                matches = set(postings[0]).intersection(*postings[1:])
+                counts = dict.fromkeys(matches, len(include))
+            else:
+                counts = Counter(
+                    recipe_id
+                    for ingredient_id in include
+                    for recipe_id in self._postings.get(ingredient_id, ())
+                )
+                # Recipes sharing no ingredients qualify if they are short.
+                for recipe_id, ingredient_ids in self._recipes.items():
+                    if recipe_id not in counts and (
+                        max_missing is None or len(ingredient_ids) <= max_missing
+                    ):
+                        counts[recipe_id] = 0
+            rows = []
+            for recipe_id, count in counts.items():
+                if recipe_id in excluded:
+                    continue
+                number = len(self._recipes[recipe_id]) - count
+                if max_missing is None or number <= max_missing:
+                    rows.append((number, self._published[recipe_id], recipe_id))
+            return rows
+
+
+class RankedRecipes:
+    # Recipes ranked in memory: rows of the values of `ordering`, the last
+    # one being the id, hydrated from `queryset` a page at a time. Page
+    # number pagination slices it like a queryset; KeysetPagination pages
+    # it with get_page.
+    def __init__(self, queryset, ordering, rows):
+        self.queryset = queryset
+        self.model = queryset.model
+        self.ordering = list(ordering)
+        for index in reversed(range(len(self.ordering))):
+            rows.sort(key=itemgetter(index), reverse=self.ordering[index][0] == "-")
+        self.rows = rows
+        self.ids = {row[-1] for row in rows}
+
+    def count(self):
+        return len(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, index):
+        return self.hydrate(self.rows[index])
+
+    def get(self, **kwargs):
+        recipe = self.queryset.get(**kwargs)
+        if recipe.pk not in self.ids:
+            raise self.model.DoesNotExist
+        return recipe
+
+    def hydrate(self, rows):
+        recipes = self.queryset.filter(id__in=[row[-1] for row in rows]).in_bulk()
+        names = [field.lstrip("-") for field in self.ordering]
+        page = []
+        for row in rows:
+            recipe = recipes.get(row[-1])
+            if recipe is not None:
+                recipe.__dict__.update(zip(names, row))
+                page.append(recipe)
+        return page
+
+    def compare(self, row, position):
+        for field, value, other in zip(self.ordering, row, position):
+            if value != other:
+                after = value > other
+                return 1 if after != (field[0] == "-") else -1
+        return 0
+
+    def bisect(self, position, inclusive):
+        # Number of rows before `position`, and with `inclusive` at it.
+        low, high = 0, len(self.rows)
+        while low < high:
+            middle = (low + high) // 2
+            order = self.compare(self.rows[middle], position)
+            if order < 0 or (inclusive and order == 0):
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def get_page(self, ordering, position, limit):
+        if ordering == self.ordering:
+            start = 0 if position is None else self.bisect(position, True)
+            end = start + limit
+            return self.hydrate(self.rows[start:end])
+        end = len(self.rows) if position is None else self.bisect(position, False)
+        start = max(end - limit, 0)
+        return self.hydrate(self.rows[start:end][::-1])
+
+
+recipe_index = RecipeIngredientIndex()
@@ -0,0 +1,74 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+CATALOGUE_VERSION_KEY = "recipes:version"
+INGREDIENTS_VERSION_KEY = "ingredients:version"
+
+
+def recipe_version_key(pk):
+    return f"recipes:version:{pk}"
+
+
+def new_version():
+    # Versions start from the clock rather than 1 so that an evicted version
+    # key never brings back entries cached under an old number.
+    return time.time_ns()
+
+
+def get_version(key):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, new_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_versions(*keys):
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, new_version(), None)
+
+
+def touch_recipes(recipe_ids):
+    bump_versions(CATALOGUE_VERSION_KEY, *map(recipe_version_key, recipe_ids))
+
+
+def touch_ingredients():
+    # Set to the clock rather than incremented, so the version doubles as the
+    # Last-Modified of the ingredient list.
+    cache.set(INGREDIENTS_VERSION_KEY, new_version(), None)
+
+
+def is_cache_enabled(request):
+    return bool(settings.RECIPE_CACHE_TIMEOUT) and request.user.is_anonymous
+
+
+def _url_hash(request):
+    return hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+
+
+def list_cache_key(request):
+    version = get_version(CATALOGUE_VERSION_KEY)
+    return f"recipes:list:{version}:{_url_hash(request)}"
+
+
+def detail_cache_key(request, pk):
+    version = get_version(recipe_version_key(pk))
+    return f"recipes:detail:{pk}:{version}:{_url_hash(request)}"
+
+
+def cached_response(key, get_response):
+    data = cache.get(key)
+    if data is not None:
+        return Response(data)
+    response = get_response()
+    if response.status_code == status.HTTP_200_OK:
+        cache.set(key, response.data, settings.RECIPE_CACHE_TIMEOUT)
+    return response
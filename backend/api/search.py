@@ -0,0 +1,107 @@
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+WORD_RE = re.compile(r"\w+")
+
+FTS_TABLE = "api_recipe_fts"
+FTS_TRIGGERS = {
+    "api_recipe_fts_insert": (
+        "AFTER INSERT ON api_recipe BEGIN "
+        "INSERT INTO api_recipe_fts(rowid, name, text) "
+        "VALUES (new.id, new.name, new.text); END"
+    ),
+    "api_recipe_fts_delete": (
+        "AFTER DELETE ON api_recipe BEGIN "
+        "INSERT INTO api_recipe_fts(api_recipe_fts, rowid, name, text) "
+        "VALUES ('delete', old.id, old.name, old.text); END"
+    ),
+    "api_recipe_fts_update": (
+        "AFTER UPDATE OF name, text ON api_recipe BEGIN "
+        "INSERT INTO api_recipe_fts(api_recipe_fts, rowid, name, text) "
+        "VALUES ('delete', old.id, old.name, old.text); "
+        "INSERT INTO api_recipe_fts(rowid, name, text) "
+        "VALUES (new.id, new.name, new.text); END"
+    ),
+}
+# bm25 is lower for better matches; matches in the name weigh more.
+SQLITE_RANK = f"-bm25({FTS_TABLE}, 10.0, 1.0)"
+
+POSTGRES_INDEX = "api_recipe_search_idx"
+POSTGRES_VECTOR = (
+    "(setweight(to_tsvector('russian', {table}\"name\"), 'A') || "
+    "setweight(to_tsvector('russian', {table}\"text\"), 'B'))"
+)
+
+
+def ensure_search_index(connection):
+    # Run after every migrate: SQLite drops triggers when Django rebuilds
+    # api_recipe for a schema change, so they are recreated here and the
+    # index is rebuilt from the table if any of them were missing.
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                "name, text, content='api_recipe', content_rowid='id', "
+                "tokenize='unicode61 remove_diacritics 2')"
+            )
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'trigger' "
+                "AND tbl_name = 'api_recipe'"
+            )
+            existing = {row[0] for row in cursor.fetchall()}
+            missing = FTS_TRIGGERS.keys() - existing
+            for name in missing:
+                cursor.execute(f"CREATE TRIGGER {name} {FTS_TRIGGERS[name]}")
+            if missing:
+                cursor.execute(
+                    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+                )
+        elif connection.vendor == "postgresql":
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {POSTGRES_INDEX} "
+                f"ON api_recipe USING GIN ({POSTGRES_VECTOR.format(table='')})"
+            )
+
+
+def search_recipes(queryset, query):
+    words = WORD_RE.findall(query.lower())
+    if not words:
+        return queryset
+    vendor = connections[queryset.db].vendor
+    if vendor == "sqlite":
+        # Joining the index runs MATCH once for the whole query; bm25 is then
+        # read from the joined row.
+        match = " ".join(f'"{word}"*' for word in words)
+        queryset = queryset.extra(
+            tables=[FTS_TABLE],
+            where=[f"{FTS_TABLE}.rowid = api_recipe.id", f"{FTS_TABLE} MATCH %s"],
+            params=[match],
+        )
+        rank = RawSQL(SQLITE_RANK, (), output_field=FloatField())
+    elif vendor == "postgresql":
+        vector = POSTGRES_VECTOR.format(table='"api_recipe".')
+        match = " & ".join(f"{word}:*" for word in words)
+        queryset = queryset.filter(
+            RawSQL(
+                f"{vector} @@ to_tsquery('russian', %s)",
+                (match,),
+                output_field=BooleanField(),
+            )
+        )
+        rank = RawSQL(
+            f"ts_rank({vector}, to_tsquery('russian', %s))",
+            (match,),
+            output_field=FloatField(),
+        )
+    else:
+        condition = Q()
+        for word in words:
+            condition &= Q(name__icontains=word) | Q(text__icontains=word)
+        queryset = queryset.filter(condition)
+        rank = Value(0.0, output_field=FloatField())
+    return queryset.annotate(search_rank=rank).order_by(
+        "-search_rank", "-pub_date", "-id"
+    )
@@ -1,5 +1,7 @@
 import base64
+import hashlib
 from django.core.files.base import ContentFile
+from django.db import transaction
 from djoser.serializers import UserCreateSerializer as DjoserUserCreateSerializer
 from django.core.validators import RegexValidator
 from rest_framework import serializers
@@ -14,6 +16,11 @@ from .models import (
     ShoppingCart,
     Subscribe,
 )
+from .jobs import submit_on_commit
+from .recipe_index import recipe_index
+from .response_cache import touch_recipes
+from .shopping_list import update_recipe_in_shopping_lists
+from .similarity import update_similar_recipes
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -47,9 +54,40 @@ class UserCreateSerializer(DjoserUserCreateSerializer):
         return attrs
 
 
+class SrcsetField(serializers.Field):
+    def __init__(self, file_field, variants_field, kind="original", **kwargs):
+        self.file_field = file_field
+        self.variants_field = variants_field
+        self.kind = kind
+        kwargs["source"] = "*"
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        field_file = getattr(instance, self.file_field)
+        if not field_file:
+            return ""
+        request = self.context.get("request")
+        build_url = request.build_absolute_uri if request else str
+        variants = getattr(instance, self.variants_field)
+        if variants.get("source") != field_file.name:
+            return build_url(field_file.url) if self.kind == "original" else ""
+
+        storage = field_file.storage
+        srcset = [
+            f"{build_url(storage.url(name))} {width}w"
+            for width, name in variants[self.kind]
+        ]
+        if self.kind == "original":
+            srcset.append(f"{build_url(field_file.url)} {variants['width']}w")
+        return ", ".join(srcset)
+
+
 class CustomUserSerializer(serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField()
     avatar = serializers.SerializerMethodField()
+    avatar_srcset = SrcsetField("avatar", "avatar_variants")
+    avatar_webp_srcset = SrcsetField("avatar", "avatar_variants", kind="webp")
 
     class Meta:
         model = User
@@ -61,9 +99,13 @@ class CustomUserSerializer(serializers.ModelSerializer):
             "last_name",
             "is_subscribed",
             "avatar",
+            "avatar_srcset",
+            "avatar_webp_srcset",
         )
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, "is_subscribed"):
+            return obj.is_subscribed
         request = self.context.get("request")
         if request and request.user.is_authenticated:
             return Subscribe.objects.filter(user=request.user, author=obj).exists()
@@ -93,6 +135,28 @@ class SetPasswordSerializer(serializers.Serializer):
         return attrs
 
 
+def get_digest(file):
+    digest = hashlib.sha256()
+    for chunk in file.chunks():
+        digest.update(chunk)
+    return digest.digest()
+
+
+def is_same_file(field_file, upload):
+    if not field_file:
+        return False
+    try:
+        if field_file.size != upload.size:
+            return False
+        with field_file.open("rb"):
+            current = get_digest(field_file)
+    except OSError:
+        return False
+    same = current == get_digest(upload)
+    upload.seek(0)
+    return same
+
+
 class Base64ImageField(serializers.ImageField):
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith("data:image"):
@@ -137,6 +201,8 @@ class RecipeReadSerializer(serializers.ModelSerializer):
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
     image = Base64ImageField(required=False)
+    image_srcset = SrcsetField("image", "image_variants")
+    image_webp_srcset = SrcsetField("image", "image_variants", kind="webp")
 
     class Meta:
         model = Recipe
@@ -148,17 +214,28 @@ class RecipeReadSerializer(serializers.ModelSerializer):
             "is_in_shopping_cart",
             "name",
             "image",
+            "image_srcset",
+            "image_webp_srcset",
             "text",
             "cooking_time",
         )
 
+    def to_representation(self, instance):
+        if hasattr(instance, "is_subscribed"):
+            instance.author.is_subscribed = instance.is_subscribed
+        return super().to_representation(instance)
+
     def get_is_favorited(self, obj):
+        if hasattr(obj, "is_favorited"):
+            return obj.is_favorited
         user = self.context.get("request").user
         if user.is_anonymous:
             return False
         return Favorite.objects.filter(user=user, recipe=obj).exists()
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, "is_in_shopping_cart"):
+            return obj.is_in_shopping_cart
         user = self.context.get("request").user
         if user.is_anonymous:
             return False
@@ -185,9 +262,7 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
                 "Рецепт должен содержать хотя бы один ингредиент."
             )
 
-        ingredients = []
-        ingredient_ids = set()
-
+        items = []
         for item in value:
             ingredient_id = item.get("id")
 
@@ -195,8 +270,8 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
                 raise serializers.ValidationError("Укажите ID ингредиента.")
 
             try:
-                ingredient = Ingredient.objects.get(id=ingredient_id)
-            except Ingredient.DoesNotExist:
+                ingredient_id = int(ingredient_id)
+            except (ValueError, TypeError):
                 raise serializers.ValidationError(
                     f"Ингредиент с ID {ingredient_id} не существует."
                 )
@@ -217,16 +292,38 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
                     f" должно быть положительным числом."
                 )
 
-            if ingredient_id in ingredient_ids:
+            items.append((ingredient_id, amount))
+
+        found = Ingredient.objects.in_bulk({pk for pk, _ in items})
+        ingredients = []
+        ingredient_ids = set()
+
+        for ingredient_id, amount in items:
+            ingredient = found.get(ingredient_id)
+            if ingredient is None:
+                raise serializers.ValidationError(
+                    f"Ингредиент с ID {ingredient_id} не существует."
+                )
+
+            if ingredient.pk in ingredient_ids:
                 raise serializers.ValidationError(
                     f"Ингредиент {ingredient.name} указан более одного раза."
                 )
 
-            ingredient_ids.add(ingredient_id)
+            ingredient_ids.add(ingredient.pk)
             ingredients.append({"ingredient": ingredient, "amount": amount})
 
         return ingredients
 
+    def ingredients_changed(self, recipe, ingredient_ids):
+        # bulk_create and bulk_update send no signals, so invalidate cached
+        # reads and update the ingredient index here.
+        transaction.on_commit(lambda: touch_recipes([recipe.pk]))
+        transaction.on_commit(
+            lambda: recipe_index.update(recipe.pk, ingredient_ids, recipe.pub_date)
+        )
+        submit_on_commit(update_similar_recipes, recipe.pk)
+
     def create_ingredients(self, ingredients, recipe):
         recipe_ingredients = []
         for ingredient_data in ingredients:
@@ -238,6 +335,43 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
                 )
             )
         RecipeIngredient.objects.bulk_create(recipe_ingredients)
+        self.ingredients_changed(
+            recipe, [item.ingredient_id for item in recipe_ingredients]
+        )
+
+    def update_ingredients(self, ingredients, recipe):
+        current = {item.ingredient_id: item for item in recipe.recipe_ingredients.all()}
+        amounts = {item["ingredient"].pk: item["amount"] for item in ingredients}
+
+        created = [
+            RecipeIngredient(recipe=recipe, ingredient_id=pk, amount=amount)
+            for pk, amount in amounts.items()
+            if pk not in current
+        ]
+        removed = [item.pk for pk, item in current.items() if pk not in amounts]
+        changed = []
+        old_amounts = {}
+        for pk, item in current.items():
+            if pk in amounts and item.amount != amounts[pk]:
+                old_amounts[pk] = item.amount
+                item.amount = amounts[pk]
+                changed.append(item)
+
+        # Deleting sends post_delete, which updates the shopping lists;
+        # bulk_update and bulk_create send no signals.
+        RecipeIngredient.objects.filter(pk__in=removed).delete()
+        RecipeIngredient.objects.bulk_update(changed, ["amount"])
+        RecipeIngredient.objects.bulk_create(created)
+        update_recipe_in_shopping_lists(
+            recipe.pk,
+            old_amounts,
+            {item.ingredient_id: item.amount for item in changed + created},
+        )
+
+        # Amounts alone do not affect the index or similar recipes, and the
+        # recipe save that follows invalidates cached reads.
+        if created or removed:
+            self.ingredients_changed(recipe, list(amounts))
 
     def create(self, validated_data):
         request = self.context.get("request")
@@ -256,14 +390,16 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
             )
 
         ingredients = validated_data.pop("ingredients")
-
-        instance.ingredients.clear()
-        self.create_ingredients(ingredients, instance)
-
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-
-        instance.save()
+        if "image" in validated_data and is_same_file(
+            instance.image, validated_data["image"]
+        ):
+            del validated_data["image"]
+
+        with transaction.atomic():
+            self.update_ingredients(ingredients, instance)
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+            instance.save()
         return instance
 
     def to_representation(self, instance):
@@ -271,9 +407,19 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
 
 
 class ShortRecipeSerializer(serializers.ModelSerializer):
+    image_srcset = SrcsetField("image", "image_variants")
+    image_webp_srcset = SrcsetField("image", "image_variants", kind="webp")
+
     class Meta:
         model = Recipe
-        fields = ("id", "name", "image", "cooking_time")
+        fields = (
+            "id",
+            "name",
+            "image",
+            "image_srcset",
+            "image_webp_srcset",
+            "cooking_time",
+        )
 
 
 class SubscribeSerializer(serializers.ModelSerializer):
@@ -284,7 +430,7 @@ class SubscribeSerializer(serializers.ModelSerializer):
     last_name = serializers.ReadOnlyField(source="author.last_name")
     is_subscribed = serializers.SerializerMethodField()
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.ReadOnlyField(source="author.recipes.count")
+    recipes_count = serializers.ReadOnlyField(source="author.recipes_count")
     avatar = serializers.SerializerMethodField()
 
     class Meta:
@@ -309,12 +455,28 @@ class SubscribeSerializer(serializers.ModelSerializer):
         return None
 
     def get_is_subscribed(self, obj):
-        return Subscribe.objects.filter(user=obj.user, author=obj.author).exists()
+        return True
 
     def get_recipes(self, obj):
-        request = self.context.get("request")
-        limit = request.GET.get("recipes_limit")
-        queryset = obj.author.recipes.all()
-        if limit:
-            queryset = queryset[: int(limit)]
+        recipes = self.context.get("recipes")
+        if recipes is not None:
+            queryset = recipes.get(obj.author_id, [])
+        else:
+            queryset = obj.author.recipes.all()
+            limit = self.context.get("recipes_limit")
+            if limit is not None:
+                queryset = queryset[:limit]
         return ShortRecipeSerializer(queryset, many=True).data
+
+
+class RecipesLimitSerializer(serializers.Serializer):
+    recipes_limit = serializers.IntegerField(min_value=0, required=False)
+
+
+class BulkIdsSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=100
+    )
+
+    def validate_ids(self, value):
+        return list(dict.fromkeys(value))
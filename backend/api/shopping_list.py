@@ -0,0 +1,169 @@
+import csv
+import json
+
+from django.db import transaction
+from django.db.models import Case, F, Sum, When
+from django.db.models.functions import Greatest
+
+from .models import RecipeIngredient, ShoppingCart, ShoppingListItem
+
+SHOPPING_LIST_FORMATS = {
+    "txt": ("text/plain; charset=utf-8", "shopping_list.txt"),
+    "csv": ("text/csv; charset=utf-8", "shopping_list.csv"),
+    "json": ("application/json", "shopping_list.json"),
+}
+
+
+def get_amounts(recipe_ids):
+    rows = (
+        RecipeIngredient.objects.filter(recipe_id__in=recipe_ids)
+        .order_by()
+        .values("ingredient_id")
+        .annotate(total=Sum("amount"))
+        .values_list("ingredient_id", "total")
+    )
+    return dict(rows)
+
+
+def get_changes(old, new):
+    changes = {}
+    for ingredient_id in old.keys() | new.keys():
+        delta = new.get(ingredient_id, 0) - old.get(ingredient_id, 0)
+        if delta:
+            changes[ingredient_id] = delta
+    return changes
+
+
+def update_shopping_lists(user_ids, changes, sign=1):
+    # user_ids may be a list or a values_list queryset of every user whose
+    # list changes by the same amounts.
+    if not changes:
+        return
+    items = ShoppingListItem.objects.filter(
+        user_id__in=user_ids, ingredient_id__in=list(changes)
+    )
+    # Rows start at zero and are incremented in place, so concurrent
+    # additions of the same ingredient never overwrite each other.
+    added = [pk for pk, delta in changes.items() if delta * sign > 0]
+    if added:
+        ShoppingListItem.objects.bulk_create(
+            (
+                ShoppingListItem(user_id=user_id, ingredient_id=ingredient_id)
+                for user_id in user_ids
+                for ingredient_id in added
+            ),
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+    # Clamped at zero, so a list that drifted from the carts cannot fail the
+    # positive amount check.
+    items.update(
+        total_amount=Case(
+            *(
+                When(
+                    ingredient_id=pk,
+                    then=Greatest(F("total_amount") + delta * sign, 0),
+                )
+                for pk, delta in changes.items()
+            ),
+            default=F("total_amount"),
+        )
+    )
+    items.filter(total_amount__lte=0).delete()
+
+
+def add_to_shopping_list(user_id, recipe_ids):
+    update_shopping_lists([user_id], get_amounts(recipe_ids))
+
+
+def remove_from_shopping_list(user_id, recipe_ids):
+    update_shopping_lists([user_id], get_amounts(recipe_ids), sign=-1)
+
+
+def update_recipe_in_shopping_lists(recipe_id, old, new):
+    user_ids = ShoppingCart.objects.filter(recipe_id=recipe_id).values_list(
+        "user_id", flat=True
+    )
+    update_shopping_lists(user_ids, get_changes(old, new))
+
+
+def rebuild_shopping_lists(batch_size=1000):
+    rows = (
+        RecipeIngredient.objects.filter(recipe__shopping_cart__isnull=False)
+        .order_by()
+        .values("recipe__shopping_cart__user_id", "ingredient_id")
+        .annotate(total=Sum("amount"))
+        .values_list("recipe__shopping_cart__user_id", "ingredient_id", "total")
+    )
+    with transaction.atomic():
+        ShoppingListItem.objects.all().delete()
+        ShoppingListItem.objects.bulk_create(
+            (
+                ShoppingListItem(
+                    user_id=user_id, ingredient_id=ingredient_id, total_amount=total
+                )
+                for user_id, ingredient_id, total in rows.iterator()
+            ),
+            batch_size=batch_size,
+        )
+        return ShoppingListItem.objects.count()
+
+
+def get_shopping_list(user):
+    return (
+        ShoppingListItem.objects.filter(user=user)
+        .values("ingredient__name", "ingredient__measurement_unit", "total_amount")
+        .order_by("ingredient__name", "ingredient__measurement_unit")
+    )
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def render_txt(rows):
+    yield "Список покупок:\n\n"
+    for row in rows:
+        yield (
+            f"{row['ingredient__name']} "
+            f"({row['ingredient__measurement_unit']}) - {row['total_amount']}\n"
+        )
+
+
+def render_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(("name", "measurement_unit", "amount"))
+    for row in rows:
+        yield writer.writerow(
+            (
+                row["ingredient__name"],
+                row["ingredient__measurement_unit"],
+                row["total_amount"],
+            )
+        )
+
+
+def render_json(rows):
+    yield "["
+    separator = ""
+    for row in rows:
+        item = {
+            "name": row["ingredient__name"],
+            "measurement_unit": row["ingredient__measurement_unit"],
+            "amount": row["total_amount"],
+        }
+        yield separator + json.dumps(item, ensure_ascii=False)
+        separator = ", "
+    yield "]"
+
+
+RENDERERS = {
+    "txt": render_txt,
+    "csv": render_csv,
+    "json": render_json,
+}
+
+
+def render_shopping_list(rows, output_format):
+    return RENDERERS[output_format](rows)
@@ -0,0 +1,231 @@
+from django.apps import apps
+from django.db import connections, transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_migrate,
+    post_save,
+    pre_save,
+)
+from django.dispatch import receiver
+
+from .counters import increment
+from .database import configure_sqlite
+from .feed import backfill_feed, fan_out_recipe, trim_feed
+from .images import schedule_variants, update_recipe_image, update_user_avatar
+from .ingredient_index import ingredient_index
+from .jobs import schedule
+from .popularity import WEIGHTS, add_event, remove_event
+from .models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCart,
+    Subscribe,
+    User,
+)
+from .recipe_index import recipe_index
+from .response_cache import touch_ingredients, touch_recipes
+from .search import ensure_search_index
+from .shopping_list import (
+    add_to_shopping_list,
+    remove_from_shopping_list,
+    update_recipe_in_shopping_lists,
+)
+
+
+@receiver(connection_created)
+def tune_connection(sender, connection, **kwargs):
+    configure_sqlite(connection)
+
+
+@receiver(post_migrate)
+def install_search_index(sender, using, **kwargs):
+    if sender is apps.get_app_config("api"):
+        ensure_search_index(connections[using])
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_ingredient_index(sender, **kwargs):
+    transaction.on_commit(ingredient_index.invalidate)
+    transaction.on_commit(touch_ingredients)
+
+
+@receiver(post_delete, sender=Recipe)
+def remove_from_recipe_index(sender, instance, **kwargs):
+    recipe_id = instance.pk
+    transaction.on_commit(lambda: recipe_index.remove(recipe_id))
+
+
+COUNTERS = {
+    Favorite: (Recipe, "recipe_id", "favorites_count"),
+    ShoppingCart: (Recipe, "recipe_id", "shopping_cart_count"),
+    Recipe: (User, "author_id", "recipes_count"),
+    Subscribe: (User, "author_id", "followers_count"),
+}
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Subscribe)
+def increment_counter(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        model, attr, field = COUNTERS[sender]
+        increment(model, getattr(instance, attr), field, 1)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Subscribe)
+def decrement_counter(sender, instance, **kwargs):
+    model, attr, field = COUNTERS[sender]
+    increment(model, getattr(instance, attr), field, -1)
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_new_recipe(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        schedule(fan_out_recipe, instance.pk)
+
+
+@receiver(post_save, sender=Subscribe)
+def backfill_new_subscription(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        schedule(backfill_feed, instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Subscribe)
+def trim_cancelled_subscription(sender, instance, **kwargs):
+    trim_feed(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+def add_popularity(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        add_event([instance.recipe_id], WEIGHTS[sender], instance.created_at)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+def remove_popularity(sender, instance, **kwargs):
+    remove_event(instance.recipe_id, WEIGHTS[sender], instance.created_at)
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_shopping_list_items(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        add_to_shopping_list(instance.user_id, [instance.recipe_id])
+
+
+# When a recipe is deleted, the cascade removes its cart rows and its
+# ingredients one model after the other. Whichever goes second finds
+# nothing left to subtract, so the amounts are removed exactly once.
+@receiver(post_delete, sender=ShoppingCart)
+def remove_shopping_list_items(sender, instance, **kwargs):
+    remove_from_shopping_list(instance.user_id, [instance.recipe_id])
+
+
+@receiver(pre_save, sender=RecipeIngredient)
+def remember_recipe_ingredient(sender, instance, raw=False, **kwargs):
+    instance._saved_amount = None
+    if instance.pk is not None and not raw:
+        instance._saved_amount = (
+            RecipeIngredient.objects.filter(pk=instance.pk)
+            .values_list("recipe_id", "ingredient_id", "amount")
+            .first()
+        )
+
+
+@receiver(post_save, sender=RecipeIngredient)
+def update_shopping_list_items(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    old = {}
+    saved = getattr(instance, "_saved_amount", None)
+    if saved is not None:
+        recipe_id, ingredient_id, amount = saved
+        if recipe_id == instance.recipe_id:
+            old = {ingredient_id: amount}
+        else:
+            update_recipe_in_shopping_lists(recipe_id, {ingredient_id: amount}, {})
+    update_recipe_in_shopping_lists(
+        instance.recipe_id, old, {instance.ingredient_id: instance.amount}
+    )
+
+
+@receiver(post_delete, sender=RecipeIngredient)
+def remove_recipe_ingredient_items(sender, instance, **kwargs):
+    update_recipe_in_shopping_lists(
+        instance.recipe_id, {instance.ingredient_id: instance.amount}, {}
+    )
+
+
+def touch_recipes_on_commit(recipe_ids):
+    recipe_ids = list(recipe_ids)
+    transaction.on_commit(lambda: touch_recipes(recipe_ids))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def touch_recipe(sender, instance, **kwargs):
+    touch_recipes_on_commit([instance.pk])
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def touch_recipe_ingredient(sender, instance, **kwargs):
+    touch_recipes_on_commit([instance.recipe_id])
+
+
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def touch_recipe_ingredients(sender, instance, action, reverse, pk_set, **kwargs):
+    if action.startswith("post_"):
+        if reverse:
+            touch_recipes_on_commit(pk_set or [])
+        else:
+            touch_recipes_on_commit([instance.pk])
+
+
+# Fields of the author shown with recipes. Saves limited to other fields,
+# such as last_login on every token login, keep cached pages.
+AUTHOR_FIELDS = {"username", "first_name", "last_name", "avatar", "avatar_variants"}
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def touch_author_recipes(sender, instance, created=False, update_fields=None, **kwargs):
+    if update_fields is not None and not AUTHOR_FIELDS & set(update_fields):
+        return
+    if not created:
+        touch_recipes_on_commit(
+            Recipe.objects.filter(author_id=instance.pk).values_list("id", flat=True)
+        )
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def touch_ingredient_recipes(sender, instance, created=False, **kwargs):
+    if not created:
+        touch_recipes_on_commit(
+            RecipeIngredient.objects.filter(ingredient_id=instance.pk).values_list(
+                "recipe_id", flat=True
+            )
+        )
+
+
+@receiver(post_save, sender=Recipe)
+def schedule_recipe_image_variants(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schedule_variants(update_recipe_image, instance, "image", "image_variants")
+
+
+@receiver(post_save, sender=User)
+def schedule_avatar_variants(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schedule_variants(update_user_avatar, instance, "avatar", "avatar_variants")
@@ -0,0 +1,136 @@
+from collections import Counter, defaultdict
+from operator import attrgetter
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from scipy import sparse
+from scipy.sparse import linalg
+
+from .models import RecipeIngredient, SimilarRecipe
+from .recipe_index import recipe_index
+
+# Only the recipes closest to a new or edited one get it added to their own
+# lists; farther ones rarely rank it in their top k and are corrected by the
+# next compute_similar_recipes run.
+NEIGHBOUR_UPDATES = 100
+
+
+def get_idf(frequencies, total):
+    frequencies = np.asarray(frequencies, dtype=np.float64)
+    return np.log((1 + total) / (1 + frequencies)) + 1
+
+
+def build_matrix(ingredient_lists, columns, idf):
+    # Binary ingredient weights scaled by idf. Rows have unit length, so the
+    # product of two rows is their cosine similarity.
+    indptr = np.zeros(len(ingredient_lists) + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum([len(ids) for ids in ingredient_lists])
+    indices = np.fromiter(
+        (columns[pk] for ids in ingredient_lists for pk in ids),
+        dtype=np.int64,
+        count=indptr[-1],
+    )
+    matrix = sparse.csr_matrix(
+        (idf[indices], indices, indptr), shape=(len(ingredient_lists), len(idf))
+    )
+    norms = linalg.norm(matrix, axis=1)
+    norms[norms == 0] = 1
+    return sparse.csr_matrix(sparse.diags(1 / norms) @ matrix)
+
+
+def top_k(scores, row, k, exclude):
+    start, end = scores.indptr[row], scores.indptr[row + 1]
+    indices = scores.indices[start:end]
+    values = scores.data[start:end]
+    keep = indices != exclude
+    indices, values = indices[keep], values[keep]
+    if len(values) > k:
+        best = np.argpartition(-values, k)[:k]
+        indices, values = indices[best], values[best]
+    order = np.argsort(-values, kind="stable")
+    return zip(indices[order].tolist(), values[order].tolist())
+
+
+def load_ingredient_lists():
+    recipes = {}
+    rows = RecipeIngredient.objects.order_by("recipe_id").values_list(
+        "recipe_id", "ingredient_id"
+    )
+    for recipe_id, ingredient_id in rows.iterator():
+        recipes.setdefault(recipe_id, []).append(ingredient_id)
+    return recipes
+
+
+def compute_similar_recipes(k, batch_size):
+    recipes = load_ingredient_lists()
+    recipe_ids = list(recipes)
+    ingredient_lists = list(recipes.values())
+    frequencies = Counter(pk for ids in ingredient_lists for pk in ids)
+    columns = {pk: column for column, pk in enumerate(frequencies)}
+    idf = get_idf(list(frequencies.values()), len(recipe_ids))
+    matrix = build_matrix(ingredient_lists, columns, idf)
+    transposed = matrix.T.tocsr()
+
+    for start in range(0, len(recipe_ids), batch_size):
+        end = start + batch_size
+        batch = recipe_ids[start:end]
+        scores = (matrix[start:end] @ transposed).tocsr()
+        entries = [
+            SimilarRecipe(
+                recipe_id=recipe_id, similar_id=recipe_ids[column], score=score
+            )
+            for row, recipe_id in enumerate(batch)
+            for column, score in top_k(scores, row, k, exclude=start + row)
+        ]
+        with transaction.atomic():
+            SimilarRecipe.objects.filter(recipe_id__in=batch).delete()
+            SimilarRecipe.objects.bulk_create(entries)
+
+    SimilarRecipe.objects.filter(
+        ~Exists(RecipeIngredient.objects.filter(recipe=OuterRef("recipe")))
+    ).delete()
+    return len(recipe_ids)
+
+
+def score_recipe(recipe_id):
+    ingredient_ids, neighbours, frequencies, total = recipe_index.related(recipe_id)
+    if not ingredient_ids or not neighbours:
+        return []
+    columns = {pk: column for column, pk in enumerate(frequencies)}
+    idf = get_idf(list(frequencies.values()), total)
+    matrix = build_matrix([ingredient_ids, *neighbours.values()], columns, idf)
+    similarity = (matrix[1:] @ matrix[0].T).toarray().ravel()
+    scores = zip(neighbours, similarity.tolist())
+    return sorted(scores, key=lambda item: item[1], reverse=True)
+
+
+def update_similar_recipes(recipe_id):
+    k = settings.SIMILAR_RECIPES_LIMIT
+    ranked = score_recipe(recipe_id)
+    closest = dict(ranked[:NEIGHBOUR_UPDATES])
+    entries = [
+        SimilarRecipe(recipe_id=recipe_id, similar_id=pk, score=score)
+        for pk, score in ranked[:k]
+    ]
+
+    with transaction.atomic():
+        SimilarRecipe.objects.filter(
+            Q(recipe_id=recipe_id) | Q(similar_id=recipe_id)
+        ).delete()
+        lists = defaultdict(list)
+        for entry in SimilarRecipe.objects.filter(recipe_id__in=closest):
+            lists[entry.recipe_id].append(entry)
+        stale = []
+        for pk, score in closest.items():
+            if len(lists[pk]) >= k:
+                weakest = min(lists[pk], key=attrgetter("score"))
+                if score <= weakest.score:
+                    continue
+                stale.append(weakest.pk)
+            entries.append(
+                SimilarRecipe(recipe_id=pk, similar_id=recipe_id, score=score)
+            )
+        SimilarRecipe.objects.filter(pk__in=stale).delete()
+        SimilarRecipe.objects.bulk_create(entries)
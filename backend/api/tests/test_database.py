@@ -0,0 +1,90 @@
+from django.db import connections
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from api.models import User
+
+
+class ReadWriteView(APIView):
+    permission_classes = (AllowAny,)
+
+    def get(self, request):
+        before = User.objects.count()
+        User.objects.create_user(
+            username="written", email="written@example.com", password="Passw0rd!!x"
+        )
+        return Response({"before": before, "after": User.objects.count()})
+
+
+urlpatterns = [
+    path("api/", include("api.urls")),
+    path("read-write/", ReadWriteView.as_view()),
+]
+
+
+# Not TestCase: the replica mirror is a separate connection and would not see
+# rows left uncommitted in the primary's test transaction.
+@override_settings(
+    ROOT_URLCONF=__name__,
+    REPLICA_READ_VIEWS=[
+        "api.views.UserViewSet",
+        f"{__name__}.ReadWriteView",
+    ],
+)
+class ReplicaRoutingTests(TransactionTestCase):
+    databases = {"default", "replica_0"}
+
+    def setUp(self):
+        self.author = User.objects.create_user(
+            username="author", email="author@example.com", password="Passw0rd!!x"
+        )
+
+    def request(self, method, url, **kwargs):
+        with CaptureQueriesContext(connections["default"]) as primary:
+            with CaptureQueriesContext(connections["replica_0"]) as replica:
+                response = getattr(self.client, method)(url, **kwargs)
+        return response, primary.captured_queries, replica.captured_queries
+
+    def test_listed_view_reads_from_replica(self):
+        response, primary, replica = self.request(
+            "get", f"/api/users/{self.author.pk}/"
+        )
+        self.assertEqual(response.json()["username"], "author")
+        self.assertEqual(primary, [])
+        self.assertTrue(replica)
+
+    def test_write_goes_to_primary(self):
+        response, primary, replica = self.request(
+            "post",
+            "/api/users/",
+            data={
+                "username": "reader",
+                "email": "reader@example.com",
+                "first_name": "Ivan",
+                "last_name": "Ivanov",
+                "password": "Passw0rd!!x",
+            },
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(replica, [])
+        self.assertTrue(any(query["sql"].startswith("INSERT") for query in primary))
+
+    def test_reads_after_write_stay_on_primary(self):
+        response, primary, replica = self.request("get", "/read-write/")
+        self.assertEqual(response.json(), {"before": 1, "after": 2})
+        self.assertEqual(len(replica), 1)
+        self.assertTrue(replica[0]["sql"].startswith("SELECT COUNT"))
+        self.assertTrue(primary[-1]["sql"].startswith("SELECT COUNT"))
+        self.assertFalse(
+            any(query["sql"].startswith("SELECT COUNT") for query in primary[:-1])
+        )
+
+    def test_reads_outside_listed_views_stay_on_primary(self):
+        response, primary, replica = self.request("get", "/api/ingredients/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(replica, [])
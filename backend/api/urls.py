@@ -1,6 +1,7 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
-from . import views
+from . import async_views, views
 
 router = DefaultRouter()
 router.register("users", views.UserViewSet, basename="users")
@@ -11,3 +12,11 @@ urlpatterns = [
     path("", include(router.urls)),
     path("auth/", include("djoser.urls.authtoken")),
 ]
+
+if settings.ASYNC_READ_VIEWS:
+    urlpatterns = [
+        path("recipes/", async_views.recipe_list),
+        path("recipes/<int:pk>/", async_views.recipe_detail),
+        path("ingredients/", async_views.ingredient_list),
+        path("users/me/", async_views.me),
+    ] + urlpatterns
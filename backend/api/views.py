@@ -1,19 +1,59 @@
-from django.http import HttpResponse
+from django.conf import settings
+from django.db.models import BooleanField, Exists, F, OuterRef, Prefetch, Value, Window
+from django.db.models.functions import RowNumber
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_vary_headers
+from django.utils.decorators import method_decorator
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet as DjoserUserViewSet
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
+from rest_framework.negotiation import DefaultContentNegotiation
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 
-from .models import Favorite, Ingredient, Recipe, ShoppingCart, Subscribe, User
+from .models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCart,
+    SimilarRecipe,
+    Subscribe,
+    User,
+)
+from .bulk import (
+    add_recipes,
+    add_subscriptions,
+    clear_shopping_cart,
+    remove_recipes,
+    remove_subscriptions,
+)
+from .compression import choose_encoding
+from .feed import FeedPagination
+from .conditional import (
+    conditional,
+    get_cached_state,
+    ingredients_state,
+    recipe_state,
+    user_state,
+)
 from .filters import IngredientFilter, RecipeFilter
+from .ingredient_index import ingredient_index
+from .response_cache import (
+    cached_response,
+    detail_cache_key,
+    is_cache_enabled,
+    list_cache_key,
+)
 from .pagination import CustomPagination
 from .permissions import IsAuthorOrReadOnly
 from .serializers import (
+    BulkIdsSerializer,
     IngredientSerializer,
     RecipeReadSerializer,
+    RecipesLimitSerializer,
     RecipeWriteSerializer,
     ShortRecipeSerializer,
     SubscribeSerializer,
@@ -22,6 +62,84 @@ from .serializers import (
     SetPasswordSerializer,
     AvatarSerializer,
 )
+from .shopping_list import (
+    SHOPPING_LIST_FORMATS,
+    get_shopping_list,
+    render_shopping_list,
+)
+
+
+class IgnoreFormatNegotiation(DefaultContentNegotiation):
+    def filter_renderers(self, renderers, format):
+        return renderers
+
+
+def get_latest_recipes(author_ids, limit=None):
+    queryset = Recipe.objects.filter(author_id__in=author_ids)
+    if limit is not None:
+        queryset = queryset.annotate(
+            recipe_rank=Window(
+                RowNumber(),
+                partition_by=[F("author_id")],
+                order_by=[F("pub_date").desc(), F("id").desc()],
+            )
+        )
+        sql, params = queryset.query.sql_with_params()
+        queryset = Recipe.objects.raw(
+            f"SELECT * FROM ({sql}) ranked WHERE recipe_rank <= %s "
+            f"ORDER BY author_id, recipe_rank",
+            (*params, limit),
+        )
+    recipes = {author_id: [] for author_id in author_ids}
+    for recipe in queryset:
+        recipes[recipe.author_id].append(recipe)
+    return recipes
+
+
+def get_recipe_queryset(user):
+    queryset = Recipe.objects.select_related("author").prefetch_related(
+        Prefetch(
+            "recipe_ingredients",
+            queryset=RecipeIngredient.objects.select_related("ingredient"),
+        )
+    )
+    if not user.is_authenticated:
+        false = Value(False, output_field=BooleanField())
+        return queryset.annotate(
+            is_favorited=false,
+            is_in_shopping_cart=false,
+            is_subscribed=false,
+        )
+    return queryset.annotate(
+        is_favorited=Exists(Favorite.objects.filter(user=user, recipe=OuterRef("pk"))),
+        is_in_shopping_cart=Exists(
+            ShoppingCart.objects.filter(user=user, recipe=OuterRef("pk"))
+        ),
+        is_subscribed=Exists(
+            Subscribe.objects.filter(user=user, author=OuterRef("author"))
+        ),
+    )
+
+
+def get_recipes_limit(request):
+    serializer = RecipesLimitSerializer(data=request.query_params)
+    serializer.is_valid(raise_exception=True)
+    return serializer.validated_data.get("recipes_limit")
+
+
+def get_bulk_ids(request):
+    serializer = BulkIdsSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    return serializer.validated_data["ids"]
+
+
+def bulk_recipes(request, model):
+    ids = get_bulk_ids(request)
+    if request.method == "POST":
+        results = add_recipes(model, request.user, ids)
+    else:
+        results = remove_recipes(model, request.user, ids)
+    return Response({"results": results})
 
 
 class UserViewSet(DjoserUserViewSet):
@@ -39,6 +157,10 @@ class UserViewSet(DjoserUserViewSet):
             return [AllowAny()]
         return [IsAuthenticated()]
 
+    @method_decorator(conditional(user_state))
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
     @action(detail=False, methods=["post"], permission_classes=[IsAuthenticated])
     def set_password(self, request):
         user = request.user
@@ -66,9 +188,17 @@ class UserViewSet(DjoserUserViewSet):
     )
     def subscriptions(self, request):
         user = request.user
-        queryset = Subscribe.objects.filter(user=user).order_by("id")
+        recipes_limit = get_recipes_limit(request)
+        queryset = (
+            Subscribe.objects.filter(user=user).select_related("author").order_by("id")
+        )
         pages = self.paginate_queryset(queryset)
-        serializer = SubscribeSerializer(pages, many=True, context={"request": request})
+        recipes = get_latest_recipes(
+            [subscription.author_id for subscription in pages], recipes_limit
+        )
+        serializer = SubscribeSerializer(
+            pages, many=True, context={"request": request, "recipes": recipes}
+        )
         return self.get_paginated_response(serializer.data)
 
     @action(
@@ -80,6 +210,7 @@ class UserViewSet(DjoserUserViewSet):
         user = request.user
 
         if request.method == "POST":
+            recipes_limit = get_recipes_limit(request)
             if user == author:
                 return Response(
                     {"errors": "Нельзя подписаться на самого себя"},
@@ -92,7 +223,10 @@ class UserViewSet(DjoserUserViewSet):
                 )
 
             subscribe = Subscribe.objects.create(user=user, author=author)
-            serializer = SubscribeSerializer(subscribe, context={"request": request})
+            serializer = SubscribeSerializer(
+                subscribe,
+                context={"request": request, "recipes_limit": recipes_limit},
+            )
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
         if request.method == "DELETE":
@@ -107,6 +241,21 @@ class UserViewSet(DjoserUserViewSet):
             subscription.delete()
             return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @action(
+        detail=False,
+        methods=["post", "delete"],
+        permission_classes=[IsAuthenticated],
+        url_path="subscribe",
+        url_name="subscribe-bulk",
+    )
+    def subscribe_bulk(self, request):
+        ids = get_bulk_ids(request)
+        if request.method == "POST":
+            results = add_subscriptions(request.user, ids)
+        else:
+            results = remove_subscriptions(request.user, ids)
+        return Response({"results": results})
+
     @action(
         detail=False,
         methods=["put", "patch", "delete"],
@@ -157,6 +306,28 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     filterset_class = IngredientFilter
     pagination_class = None
 
+    @method_decorator(conditional(ingredients_state))
+    def list(self, request, *args, **kwargs):
+        state = get_cached_state(ingredients_state, request)
+        ingredient_index.sync(state[0])
+
+        name = request.query_params.get("name")
+        if name:
+            return Response(
+                ingredient_index.search(name, settings.INGREDIENT_SEARCH_LIMIT)
+            )
+
+        encoding = choose_encoding(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        response = HttpResponse(
+            ingredient_index.payload()[encoding], content_type="application/json"
+        )
+        if encoding != "identity":
+            response["Content-Encoding"] = encoding
+            # The encoded body is not byte-identical to the canonical one.
+            response["ETag"] = f'W/"{state[0]}"'
+        patch_vary_headers(response, ("Accept-Encoding",))
+        return response
+
 
 class RecipeViewSet(viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
@@ -165,11 +336,63 @@ class RecipeViewSet(viewsets.ModelViewSet):
     filterset_class = RecipeFilter
     pagination_class = CustomPagination
 
+    def get_queryset(self):
+        return get_recipe_queryset(self.request.user)
+
     def get_serializer_class(self):
         if self.action in ("list", "retrieve"):
             return RecipeReadSerializer
         return RecipeWriteSerializer
 
+    def list(self, request, *args, **kwargs):
+        if not is_cache_enabled(request):
+            return super().list(request, *args, **kwargs)
+        return cached_response(
+            list_cache_key(request),
+            lambda: super(RecipeViewSet, self).list(request, *args, **kwargs),
+        )
+
+    @method_decorator(conditional(recipe_state))
+    def retrieve(self, request, *args, **kwargs):
+        if not is_cache_enabled(request):
+            return super().retrieve(request, *args, **kwargs)
+        return cached_response(
+            detail_cache_key(request, kwargs["pk"]),
+            lambda: super(RecipeViewSet, self).retrieve(request, *args, **kwargs),
+        )
+
+    @action(
+        detail=False,
+        methods=["get"],
+        permission_classes=[IsAuthenticated],
+        pagination_class=FeedPagination,
+    )
+    def feed(self, request):
+        page = self.paginate_queryset(self.get_queryset())
+        serializer = RecipeReadSerializer(page, many=True, context={"request": request})
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=True, methods=["get"], permission_classes=[AllowAny])
+    def similar(self, request, pk=None):
+        try:
+            entries = list(
+                SimilarRecipe.objects.filter(recipe_id=pk)
+                .select_related("similar")
+                .order_by("-score")
+            )
+            if not entries:
+                Recipe.objects.only("id").get(pk=pk)
+        except (Recipe.DoesNotExist, ValueError):
+            return Response(
+                {"error": "Рецепт не найден"}, status=status.HTTP_404_NOT_FOUND
+            )
+        serializer = ShortRecipeSerializer(
+            [entry.similar for entry in entries],
+            many=True,
+            context={"request": request},
+        )
+        return Response(serializer.data)
+
     @action(
         detail=True, methods=["GET"], url_path="get-link", permission_classes=[AllowAny]
     )
@@ -248,32 +471,56 @@ class RecipeViewSet(viewsets.ModelViewSet):
             shopping_cart.delete()
             return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @action(
+        detail=False,
+        methods=["post", "delete"],
+        permission_classes=[IsAuthenticated],
+        url_path="favorite",
+        url_name="favorite-bulk",
+    )
+    def favorite_bulk(self, request):
+        return bulk_recipes(request, Favorite)
+
+    @action(
+        detail=False,
+        methods=["post", "delete"],
+        permission_classes=[IsAuthenticated],
+        url_path="shopping_cart",
+        url_name="shopping-cart-bulk",
+    )
+    def shopping_cart_bulk(self, request):
+        return bulk_recipes(request, ShoppingCart)
+
+    @action(
+        detail=False,
+        methods=["delete"],
+        permission_classes=[IsAuthenticated],
+        url_path="shopping_cart/clear",
+        url_name="shopping-cart-clear",
+    )
+    def clear_cart(self, request):
+        clear_shopping_cart(request.user)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
     @action(
         detail=False,
         methods=["get"],
         permission_classes=[IsAuthenticated],
         url_path="download_shopping_cart",
+        content_negotiation_class=IgnoreFormatNegotiation,
     )
     def download_shopping_cart(self, request):
-        user = request.user
-        shopping_cart = user.shopping_cart.all()
-
-        ingredients = {}
-        for item in shopping_cart:
-            for recipe_ingredient in item.recipe.recipe_ingredients.all():
-                key = (
-                    recipe_ingredient.ingredient.name,
-                    recipe_ingredient.ingredient.measurement_unit,
-                )
-                if key in ingredients:
-                    ingredients[key] += recipe_ingredient.amount
-                else:
-                    ingredients[key] = recipe_ingredient.amount
-
-        shopping_list = "Список покупок:\n\n"
-        for (name, unit), amount in ingredients.items():
-            shopping_list += f"{name} ({unit}) - {amount}\n"
+        output_format = request.query_params.get("format", "txt")
+        if output_format not in SHOPPING_LIST_FORMATS:
+            return Response(
+                {"errors": "Неизвестный формат списка покупок"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
-        response = HttpResponse(shopping_list, content_type="text/plain")
-        response["Content-Disposition"] = 'attachment; filename="shopping_list.txt"'
+        content_type, filename = SHOPPING_LIST_FORMATS[output_format]
+        rows = get_shopping_list(request.user).iterator()
+        response = StreamingHttpResponse(
+            render_shopping_list(rows, output_format), content_type=content_type
+        )
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
         return response
@@ -0,0 +1,143 @@
+"""Compare the WSGI and ASGI deployment profiles under the same load.
+
+Starts gunicorn with ``foodgram.wsgi`` and then with ``foodgram.asgi`` on
+uvicorn workers (with ASYNC_READ_VIEWS enabled), using the same number of
+workers, and reports requests/sec and latency percentiles for the hot read
+endpoints. Run from the ``backend`` directory against a migrated database::
+
+    python benchmarks/asgi_vs_wsgi.py --workers 4 --concurrency 64
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+from urllib.parse import quote, urlsplit
+
+PROFILES = {
+    "wsgi": (["foodgram.wsgi"], {}),
+    "asgi": (
+        ["-k", "uvicorn.workers.UvicornWorker", "foodgram.asgi"],
+        {"ASYNC_READ_VIEWS": "True"},
+    ),
+}
+
+DEFAULT_PATHS = (
+    "/api/recipes/",
+    "/api/recipes/?limit=6",
+    "/api/ingredients/?name=мо",
+)
+
+
+async def fetch(host, port, path, token):
+    reader, writer = await asyncio.open_connection(host, port)
+    path = quote(path, safe="/?=&")
+    headers = f"GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n"
+    if token:
+        headers += f"Authorization: Token {token}\r\n"
+    writer.write((headers + "\r\n").encode())
+    await writer.drain()
+    status_line = await reader.readline()
+    await reader.read()
+    writer.close()
+    return int(status_line.split()[1])
+
+
+async def load(url, paths, concurrency, duration, token):
+    parts = urlsplit(url)
+    deadline = time.perf_counter() + duration
+    latencies = []
+    errors = 0
+
+    async def client(number):
+        nonlocal errors
+        position = number
+        while time.perf_counter() < deadline:
+            path = paths[position % len(paths)]
+            position += 1
+            started = time.perf_counter()
+            try:
+                status = await fetch(parts.hostname, parts.port, path, token)
+            except OSError:
+                status = 0
+            latencies.append(time.perf_counter() - started)
+            if status != 200:
+                errors += 1
+
+    await asyncio.gather(*(client(number) for number in range(concurrency)))
+    return latencies, errors
+
+
+def wait_for(url, timeout=30):
+    parts = urlsplit(url)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            asyncio.run(fetch(parts.hostname, parts.port, "/api/ingredients/", None))
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not start")
+
+
+def run_profile(name, args):
+    gunicorn_args, env = PROFILES[name]
+    url = f"http://127.0.0.1:{args.port}"
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "gunicorn",
+            "--bind",
+            f"127.0.0.1:{args.port}",
+            "--workers",
+            str(args.workers),
+            "--log-level",
+            "warning",
+            *gunicorn_args,
+        ],
+        env={**os.environ, **env},
+    )
+    try:
+        wait_for(url)
+        asyncio.run(load(url, args.paths, args.concurrency, 2, args.token))
+        started = time.perf_counter()
+        latencies, errors = asyncio.run(
+            load(url, args.paths, args.concurrency, args.duration, args.token)
+        )
+        elapsed = time.perf_counter() - started
+    finally:
+        server.terminate()
+        server.wait()
+
+    latencies.sort()
+    quantiles = statistics.quantiles(latencies, n=100)
+    print(
+        f"{name}: {len(latencies) / elapsed:8.1f} req/s  "
+        f"p50 {quantiles[49] * 1000:7.1f} ms  "
+        f"p99 {quantiles[98] * 1000:7.1f} ms  "
+        f"errors {errors}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=15)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--token", help="Authenticate requests with this token")
+    parser.add_argument("--path", dest="paths", action="append")
+    parser.add_argument("--profile", choices=PROFILES, action="append")
+    args = parser.parse_args()
+    args.paths = args.paths or list(DEFAULT_PATHS)
+
+    for name in args.profile or PROFILES:
+        run_profile(name, args)
+
+
+if __name__ == "__main__":
+    main()
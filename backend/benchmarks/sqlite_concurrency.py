@@ -0,0 +1,166 @@
+"""Compare the default SQLite setup with SQLITE_PERFORMANCE_PROFILE.
+
+Migrates a fresh database file for each profile, seeds users and recipes and
+then runs several processes that toggle favorites and cart items (the writes
+gunicorn workers contend on) mixed with recipe list reads. Reports operations
+per second and how many of them failed with "database is locked". Run from the
+``backend`` directory::
+
+    python benchmarks/sqlite_concurrency.py --processes 8 --duration 10
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+PROFILES = {
+    "default": {"SQLITE_PERFORMANCE_PROFILE": "False"},
+    "tuned": {"SQLITE_PERFORMANCE_PROFILE": "True"},
+}
+
+
+def setup_django():
+    sys.path.insert(0, str(BACKEND_DIR))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "foodgram.settings")
+    import django
+
+    django.setup()
+
+
+def seed(users, recipes):
+    from api.models import Recipe, User
+
+    User.objects.bulk_create(
+        User(
+            username=f"bench{number}",
+            email=f"bench{number}@example.com",
+            first_name="Bench",
+            last_name=str(number),
+        )
+        for number in range(users)
+    )
+    authors = list(User.objects.values_list("id", flat=True))
+    Recipe.objects.bulk_create(
+        Recipe(
+            author_id=random.choice(authors),
+            name=f"Рецепт {number}",
+            text="Текст",
+            image="recipes/images/bench.png",
+            cooking_time=10,
+        )
+        for number in range(recipes)
+    )
+
+
+def toggle(model, user_id, recipe_id):
+    from django.db import transaction
+
+    with transaction.atomic():
+        item, created = model.objects.get_or_create(
+            user_id=user_id, recipe_id=recipe_id
+        )
+        if not created:
+            item.delete()
+
+
+def worker(duration, write_ratio, results):
+    setup_django()
+    from django.db import OperationalError
+
+    from api.models import Favorite, Recipe, ShoppingCart, User
+    from api.views import get_recipe_queryset
+
+    users = list(User.objects.values_list("id", flat=True))
+    recipes = list(Recipe.objects.values_list("id", flat=True))
+    done = locked = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        try:
+            if random.random() < write_ratio:
+                model = random.choice((Favorite, ShoppingCart))
+                toggle(model, random.choice(users), random.choice(recipes))
+            else:
+                user = User.objects.get(pk=random.choice(users))
+                list(get_recipe_queryset(user)[:10])
+            done += 1
+        except OperationalError as error:
+            if "locked" not in str(error):
+                raise
+            locked += 1
+    results.put((done, locked))
+
+
+def run(args):
+    setup_django()
+    from django.core.management import call_command
+    from django.db import connections
+
+    call_command("migrate", verbosity=0)
+    seed(args.users, args.recipes)
+    connections.close_all()
+
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(
+            target=worker, args=(args.duration, args.write_ratio, results)
+        )
+        for _ in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    totals = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    done = sum(item[0] for item in totals)
+    locked = sum(item[1] for item in totals)
+    print(
+        f"{os.environ['BENCHMARK_PROFILE']}: "
+        f"{done / args.duration:8.1f} ops/s  locked {locked}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--processes", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--write-ratio", type=float, default=0.5)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--recipes", type=int, default=500)
+    parser.add_argument("--profile", choices=PROFILES, action="append")
+    parser.add_argument("--run", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run(args)
+        return
+
+    # Settings are read at import time, so each profile runs in its own
+    # interpreter against its own database file.
+    for name in args.profile or PROFILES:
+        with tempfile.TemporaryDirectory() as directory:
+            env = {
+                **os.environ,
+                **PROFILES[name],
+                "BENCHMARK_PROFILE": name,
+                "DB_ENGINE": "sqlite3",
+                "SQLITE_PATH": os.path.join(directory, "bench.sqlite3"),
+                "DB_REPLICAS": "",
+                "JOB_QUEUE_ENABLED": "False",
+            }
+            subprocess.run(
+                [sys.executable, __file__, "--run", *sys.argv[1:]],
+                env=env,
+                check=True,
+            )
+
+
+if __name__ == "__main__":
+    main()
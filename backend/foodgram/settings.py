@@ -1,5 +1,6 @@
 from pathlib import Path
 import os
+import sys
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -41,6 +42,7 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "api.database.ReplicaRoutingMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -56,6 +58,8 @@ REST_FRAMEWORK = {
     "PAGE_SIZE": 6,
 }
 
+INGREDIENT_SEARCH_LIMIT = int(os.getenv("INGREDIENT_SEARCH_LIMIT", 50))
+
 DJOSER = {
     "LOGIN_FIELD": "email",
     "SERIALIZERS": {
@@ -86,17 +90,100 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "foodgram.wsgi.application"
 
+ASGI_APPLICATION = "foodgram.asgi.application"
+
+# Serve the hot read endpoints from native async views; meant for the ASGI
+# deployment profile (see docker-compose.asgi.yaml).
+ASYNC_READ_VIEWS = os.getenv("ASYNC_READ_VIEWS", "False").lower() in ("true", "1")
+
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
-DATABASES = {
-    "default": {
+DB_ENGINE = os.getenv("DB_ENGINE", "sqlite3")
+
+if DB_ENGINE == "postgresql":
+    database = {
+        "ENGINE": "django.db.backends.postgresql",
+        "NAME": os.getenv("POSTGRES_DB", "django"),
+        "USER": os.getenv("POSTGRES_USER", "django"),
+        "PASSWORD": os.getenv("POSTGRES_PASSWORD", ""),
+        "HOST": os.getenv("DB_HOST", ""),
+        "PORT": os.getenv("DB_PORT", 5432),
+    }
+else:
+    database = {
         "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+        "NAME": os.getenv("SQLITE_PATH", BASE_DIR / "db.sqlite3"),
+    }
+
+# Opt-in SQLite profile for several workers writing to one file: WAL and the
+# pragmas below are applied to every new connection, and transactions start
+# with BEGIN IMMEDIATE so writers queue on busy_timeout instead of failing.
+SQLITE_PERFORMANCE_PROFILE = os.getenv(
+    "SQLITE_PERFORMANCE_PROFILE", "False"
+).lower() in ("true", "1")
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT", 5000)),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", 256 * 1024 * 1024)),
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", -64 * 1024)),
+}
+if DB_ENGINE == "sqlite3" and SQLITE_PERFORMANCE_PROFILE:
+    database["ENGINE"] = "foodgram.sqlite3"
+database["CONN_MAX_AGE"] = int(os.getenv("CONN_MAX_AGE", 60))
+
+DATABASES = {"default": database}
+
+# Read replicas: comma-separated hosts for PostgreSQL, file paths for SQLite.
+for number, replica in enumerate(filter(None, os.getenv("DB_REPLICAS", "").split(","))):
+    location = "NAME" if DB_ENGINE == "sqlite3" else "HOST"
+    DATABASES[f"replica_{number}"] = {
+        **database,
+        location: replica.strip(),
+        "TEST": {"MIRROR": "default"},
+    }
+
+# Tests get a replica mirroring the test database. Reads only go to it in
+# tests that set REPLICA_READ_VIEWS, since TestCase keeps its rows in an
+# uncommitted transaction on the primary connection.
+TESTING = sys.argv[1:2] == ["test"]
+if TESTING and "replica_0" not in DATABASES:
+    DATABASES["replica_0"] = {**database, "TEST": {"MIRROR": "default"}}
+
+DATABASE_ROUTERS = ["api.database.ReplicaRouter"]
+
+# Ping persistent connections at the start of each request.
+DB_HEALTH_CHECKS = os.getenv("DB_HEALTH_CHECKS", "True").lower() in ("true", "1")
+
+# Safe-method requests to these views read from a replica until they write.
+REPLICA_READ_VIEWS = [
+    "api.views.RecipeViewSet",
+    "api.views.IngredientViewSet",
+    "api.views.UserViewSet",
+]
+if TESTING:
+    REPLICA_READ_VIEWS = []
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Local memory is per process: with several workers use a shared backend
+# (file, memcached, redis) so cache invalidation reaches every worker.
+
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.getenv("CACHE_LOCATION", ""),
     }
 }
 
+# Seconds to keep anonymous recipe list/detail responses, 0 disables caching.
+RECIPE_CACHE_TIMEOUT = int(os.getenv("RECIPE_CACHE_TIMEOUT", 0))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -141,6 +228,33 @@ MEDIA_URL = "/media/"
 STATIC_ROOT = BASE_DIR / "static"
 STATIC_URL = "/static/"
 
+# Widths of the resized copies made for uploaded recipe images and avatars,
+# and the number of background threads making them and updating similar
+# recipes when the job queue is disabled (0 runs inline).
+IMAGE_VARIANT_WIDTHS = [
+    int(width) for width in os.getenv("IMAGE_VARIANT_WIDTHS", "320,640,1280").split(",")
+]
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", 2))
+
+# Background jobs stored in the database and run by `manage.py run_worker`.
+JOB_QUEUE_ENABLED = os.getenv("JOB_QUEUE_ENABLED", "False").lower() in ("true", "1")
+JOB_RETRY_BACKOFF = int(os.getenv("JOB_RETRY_BACKOFF", 10))
+JOB_TIMEOUT = int(os.getenv("JOB_TIMEOUT", 600))
+
+# Recipes of authors with at most this many followers are copied into the
+# followers' feeds when published; recipes of more followed authors are read
+# directly when a feed is requested. A new subscription copies in up to
+# FEED_BACKFILL_LIMIT of the author's latest recipes.
+FEED_FANOUT_MAX_FOLLOWERS = int(os.getenv("FEED_FANOUT_MAX_FOLLOWERS", 10000))
+FEED_BACKFILL_LIMIT = int(os.getenv("FEED_BACKFILL_LIMIT", 100))
+
+# Favorites and shopping cart additions count for half as much in the
+# popularity ranking after this many hours.
+POPULARITY_HALF_LIFE_HOURS = float(os.getenv("POPULARITY_HALF_LIFE_HOURS", 72))
+
+# Number of similar recipes kept for each recipe.
+SIMILAR_RECIPES_LIMIT = int(os.getenv("SIMILAR_RECIPES_LIMIT", 10))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -0,0 +1,9 @@
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def _start_transaction_under_autocommit(self):
+        # A deferred transaction that reads first and then writes cannot wait
+        # for the lock held by another writer and fails with "database is
+        # locked" right away; taking the write lock up front lets it wait.
+        self.cursor().execute("BEGIN IMMEDIATE")